@@ -39,11 +39,13 @@ from doit.cmd_help import Help as DoitHelp
 from doit.cmd_run import Run as DoitRun
 from doit.cmd_clean import Clean as DoitClean
 from doit.cmd_auto import Auto as DoitAuto
+import logbook
 from logbook import NullHandler
 
 from . import __version__
 from .nikola import Nikola
-from .utils import _reload, sys_decode, get_root_dir, LOGGER, STRICT_HANDLER
+from .utils import (_reload, sys_decode, get_root_dir, LOGGER, STDERR_HANDLER,
+                    STRICT_HANDLER)
 
 
 config = {}
@@ -89,7 +91,16 @@ def main(args):
     config.update({'__colorful__': colorful})
 
     site = Nikola(**config)
-    return DoitNikola(site, quiet).run(args)
+    doit_main = DoitNikola(site, quiet)
+    # Plain "nikola --verbose [tasks]" builds too
+    verbose = '--verbose' in args and doit_main.is_build(args)
+    if verbose:
+        for handler in STDERR_HANDLER:
+            handler.level = logbook.INFO
+    result = doit_main.run(args)
+    if verbose:
+        site.report_stats()
+    return result
 
 
 class Help(DoitHelp):
@@ -131,6 +142,15 @@ class Build(DoitRun):
                 'help': "Run quietly.",
             }
         )
+        opts.append(
+            {
+                'name': 'verbose',
+                'long': 'verbose',
+                'default': False,
+                'type': bool,
+                'help': "Log more information, including cache statistics.",
+            }
+        )
         self.cmd_options = tuple(opts)
         super(Build, self).__init__(*args, **kw)
 
@@ -193,6 +213,11 @@ class DoitNikola(DoitMain):
             cmds[name] = cmd
         return cmds
 
+    def is_build(self, args):
+        """Tell if args run a build, with the build command or without a command."""
+        args = self.process_args(args)
+        return len(args) > 0 and (args[0] == 'build' or args[0] not in self.get_commands())
+
     def run(self, cmd_args):
         sub_cmds = self.get_commands()
         args = self.process_args(cmd_args)
@@ -213,6 +238,9 @@ class DoitNikola(DoitMain):
                 LOGGER.error("This command needs to run inside an "
                              "existing Nikola site.")
                 return False
+        if args[0] not in sub_cmds.keys():
+            # Build instead of doit's run, so build options work here too
+            cmd_args = ['build'] + list(cmd_args)
         return super(DoitNikola, self).run(cmd_args)
 
     @staticmethod
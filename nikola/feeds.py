@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+
+# Copyright © 2012-2014 Roberto Alsina and others.
+
+# Permission is hereby granted, free of charge, to any
+# person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the
+# Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS
+# OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Write RSS 2.0, Atom and JSON Feed feeds."""
+
+from __future__ import unicode_literals
+import calendar
+import datetime
+from email.utils import formatdate
+import json
+import os
+from xml.sax.saxutils import escape, quoteattr
+
+import pytz
+
+from nikola import utils
+
+GENERATOR = 'Nikola'
+GENERATOR_URL = 'http://getnikola.com/'
+
+
+def to_utc(date):
+    """Return date in UTC. Naive dates are taken to be in UTC already."""
+    if date.tzinfo is None:
+        return pytz.UTC.localize(date)
+    return date.astimezone(pytz.UTC)
+
+
+def rfc822(date):
+    """Format date for RSS."""
+    return formatdate(calendar.timegm(to_utc(date).utctimetuple()), usegmt=True)
+
+
+def rfc3339(date):
+    """Format date for Atom and JSON Feed."""
+    return to_utc(date).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def element(name, text, attrs=''):
+    """Return an XML element with escaped text."""
+    return '<{0}{1}>{2}</{0}>'.format(name, attrs, escape(text))
+
+
+class RSSWriter(object):
+    """RSS 2.0, laid out like the feeds PyRSS2Gen used to write."""
+
+    mimetype = 'application/rss+xml'
+    label = 'RSS'
+
+    def header(self, feed):
+        parts = ['<?xml version="1.0" encoding="utf-8"?>\n'
+                 '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" '
+                 'xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>',
+                 element('title', feed['title']),
+                 element('link', feed['link']),
+                 element('description', feed['description'] or '')]
+        if feed['feed_url']:
+            parts.append('<atom:link href={0} rel="self" type="{1}"></atom:link>'.format(
+                quoteattr(feed['feed_url']), self.mimetype))
+        parts.append(element('language', feed['language']))
+        if feed['updated']:
+            parts.append(element('lastBuildDate', rfc822(feed['updated'])))
+        parts.append(element('generator', '{0} <{1}>'.format(GENERATOR, GENERATOR_URL)))
+        parts.append(element('docs', 'http://blogs.law.harvard.edu/tech/rss'))
+        return ''.join(parts)
+
+    def item(self, item):
+        parts = ['<item>', element('title', item['title']), element('link', item['link'])]
+        if item['description'] is not None:
+            parts.append(element('description', item['description']))
+        author = item.get('author')
+        # Yes, this is a silly way to validate an email
+        if author and '@' in author[1:]:
+            parts.append(element('author', author))
+        for category in item.get('categories', []):
+            parts.append(element('category', category))
+        if item.get('enclosure'):
+            parts.append('<enclosure url={0} length="{1}" type={2}></enclosure>'.format(
+                quoteattr(item['enclosure'][0]), item['enclosure'][1], quoteattr(item['enclosure'][2])))
+        if item.get('guid_is_permalink', True):
+            parts.append(element('guid', item['guid']))
+        else:
+            parts.append(element('guid', item['guid'], ' isPermaLink="false"'))
+        parts.append(element('pubDate', rfc822(item['date'])))
+        if author and '@' not in author[1:]:
+            parts.append(element('dc:creator', author))
+        parts.append('</item>')
+        return ''.join(parts)
+
+    def footer(self):
+        return '</channel></rss>'
+
+
+class AtomWriter(object):
+    """Atom (RFC 4287)."""
+
+    mimetype = 'application/atom+xml'
+    label = 'Atom'
+
+    def header(self, feed):
+        parts = ['<?xml version="1.0" encoding="utf-8"?>\n'
+                 '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang={0}>'.format(quoteattr(feed['language'])),
+                 element('title', feed['title'])]
+        if feed['description']:
+            parts.append(element('subtitle', feed['description']))
+        parts.append(element('id', feed['feed_url'] or feed['link']))
+        # updated is required; feeds without items get the epoch
+        parts.append(element('updated', rfc3339(feed['updated'] or datetime.datetime(1970, 1, 1))))
+        parts.append('<link href={0} rel="alternate" type="text/html"/>'.format(quoteattr(feed['link'])))
+        if feed['feed_url']:
+            parts.append('<link href={0} rel="self" type="{1}"/>'.format(
+                quoteattr(feed['feed_url']), self.mimetype))
+        if feed.get('author'):
+            parts.append('<author>{0}</author>'.format(element('name', feed['author'])))
+        parts.append(element('generator', GENERATOR, ' uri={0}'.format(quoteattr(GENERATOR_URL))))
+        return ''.join(parts)
+
+    def item(self, item):
+        # Atom ids must be URIs
+        entry_id = item['guid'] if item.get('guid_is_permalink', True) else item['link']
+        parts = ['<entry>', element('title', item['title']), element('id', entry_id),
+                 element('updated', rfc3339(item['date'])),
+                 element('published', rfc3339(item['date'])),
+                 '<link href={0} rel="alternate"/>'.format(quoteattr(item['link']))]
+        if item.get('enclosure'):
+            parts.append('<link href={0} rel="enclosure" length="{1}" type={2}/>'.format(
+                quoteattr(item['enclosure'][0]), item['enclosure'][1], quoteattr(item['enclosure'][2])))
+        if item.get('author'):
+            parts.append('<author>{0}</author>'.format(element('name', item['author'])))
+        for category in item.get('categories', []):
+            parts.append('<category term={0}/>'.format(quoteattr(category)))
+        if item['description']:
+            parts.append(element('content', item['description'], ' type="html"'))
+        parts.append('</entry>')
+        return ''.join(parts)
+
+    def footer(self):
+        return '</feed>'
+
+
+class JSONFeedWriter(object):
+    """JSON Feed, version 1."""
+
+    mimetype = 'application/json'
+    label = 'JSON Feed'
+
+    def header(self, feed):
+        data = {
+            'version': 'https://jsonfeed.org/version/1',
+            'title': feed['title'],
+            'home_page_url': feed['link'],
+        }
+        if feed['feed_url']:
+            data['feed_url'] = feed['feed_url']
+        if feed['description']:
+            data['description'] = feed['description']
+        if feed.get('author'):
+            data['author'] = {'name': feed['author']}
+        self.first = True
+        # Items are written one at a time, inside the "items" list
+        return json.dumps(data, sort_keys=True)[:-1] + ', "items": ['
+
+    def item(self, item):
+        data = {
+            'id': item['guid'],
+            'url': item['link'],
+            'title': item['title'],
+            'date_published': rfc3339(item['date']),
+        }
+        if item['description'] is not None:
+            data['content_html'] = item['description']
+        if item.get('author'):
+            data['author'] = {'name': item['author']}
+        if item.get('categories'):
+            data['tags'] = list(item['categories'])
+        if item.get('enclosure'):
+            data['attachments'] = [{
+                'url': item['enclosure'][0],
+                'size_in_bytes': item['enclosure'][1],
+                'mime_type': item['enclosure'][2],
+            }]
+        separator = '' if self.first else ', '
+        self.first = False
+        return separator + json.dumps(data, sort_keys=True)
+
+    def footer(self):
+        return ']}'
+
+
+WRITERS = {
+    'rss': RSSWriter,
+    'atom': AtomWriter,
+    'json': JSONFeedWriter,
+}
+
+EXTENSIONS = {
+    'rss': '.xml',
+    'atom': '.atom',
+    'json': '.json',
+}
+
+
+def feed_path(path, feed_format):
+    """Return where the feed_format version of the RSS feed at path goes.
+
+    Works for paths and URLs: rss.xml becomes rss.atom or rss.json.
+    """
+    if feed_format == 'rss':
+        return path
+    return os.path.splitext(path)[0] + EXTENSIONS[feed_format]
+
+
+def write_if_changed(path, data):
+    """Write data to path, unless the file already has exactly that content.
+
+    Returns True if the file was written.
+    """
+    data = data.encode('utf-8')
+    try:
+        with open(path, 'rb') as inf:
+            if inf.read() == data:
+                return False
+    except (IOError, OSError):
+        pass
+    utils.makedirs(os.path.dirname(path))
+    with open(path, 'wb+') as outf:
+        outf.write(data)
+    return True
+
+
+def write_feeds(paths, feed, items):
+    """Write a feed in several formats, in a single pass over items.
+
+    paths maps formats ('rss', 'atom' or 'json') to output paths. feed is a
+    dict with title, link, description, feed_url (of the RSS feed, or None),
+    language and optionally author. items is a sequence of dicts with
+    title, link, guid, description (or None), date, and optionally
+    guid_is_permalink (True by default), categories, author and
+    enclosure (a (url, length, mimetype) tuple).
+
+    The output only depends on feed and items (the last update is the
+    date of the newest item), and files are only written if they change,
+    so unchanged feeds keep their mtime.
+    """
+    items = list(items)
+    feed = dict(feed)
+    feed['updated'] = max(to_utc(item['date']) for item in items) if items else None
+    formats = sorted(paths)
+    writers = [WRITERS[feed_format]() for feed_format in formats]
+    parts = []
+    for feed_format, writer in zip(formats, writers):
+        feed_url = feed['feed_url'] and feed_path(feed['feed_url'], feed_format)
+        parts.append([writer.header(dict(feed, feed_url=feed_url))])
+    for item in items:
+        for writer, part in zip(writers, parts):
+            part.append(writer.item(item))
+    for feed_format, writer, part in zip(formats, writers, parts):
+        part.append(writer.footer())
+        write_if_changed(paths[feed_format], ''.join(part))
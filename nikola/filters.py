@@ -44,15 +44,21 @@ except ImportError:
 def apply_to_file(f):
     """Takes a function f that transforms a data argument, and returns
     a function that takes a filename and applies f to the contents,
-    in place."""
+    in place.
+
+    f is available as the data_filter attribute of the result, so it
+    can be applied to pages before they are written (see
+    utils.apply_filters)."""
     @wraps(f)
     def f_in_file(fname):
         with open(fname, 'rb') as inf:
             data = inf.read()
         data = f(data)
+        os.unlink(fname)  # It may be a hard link to a source file
         with open(fname, 'wb+') as outf:
             outf.write(data)
 
+    f_in_file.data_filter = f
     return f_in_file
 
 
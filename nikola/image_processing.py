@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+# Copyright © 2012-2014 Roberto Alsina and others.
+
+# Permission is hereby granted, free of charge, to any
+# person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the
+# Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the
+# Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice
+# shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+# PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS
+# OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Process images."""
+
+from __future__ import unicode_literals
+import datetime
+import io
+import os
+
+Image = None
+try:
+    from PIL import Image, ExifTags  # NOQA
+except ImportError:
+    try:
+        import Image as _Image
+        import ExifTags
+        Image = _Image
+    except ImportError:
+        pass
+
+try:
+    from PIL import features
+except ImportError:
+    features = None  # NOQA
+
+from nikola import utils
+
+# EXIF orientation tag values and the transposition that undoes them
+EXIF_ORIENTATIONS = {
+    3: 'ROTATE_180',
+    6: 'ROTATE_270',
+    8: 'ROTATE_90',
+}
+
+
+def webp_supported():
+    """Tell if PIL can write WebP images."""
+    if Image is None:
+        return False
+    if features is not None:
+        return features.check('webp')
+    # Old PIL, without PIL.features: try it
+    try:
+        Image.new('RGB', (1, 1)).save(io.BytesIO(), 'WEBP')
+    except Exception:
+        return False
+    return True
+
+
+class ImageProcessor(object):
+    """Resize images and read their EXIF data.
+
+    Expects the class it is mixed into to provide ``self.logger``.
+    """
+
+    image_ext_list_builtin = ['.jpg', '.png', '.jpeg', '.gif', '.svg', '.bmp', '.tiff']
+    dates = {}
+
+    def get_exif(self, im):
+        """Return the EXIF data of an open image as a dict of tag names."""
+        try:
+            exif = im._getexif()
+        except Exception:
+            exif = None
+        if not exif:
+            return {}
+        return dict((ExifTags.TAGS.get(tag, tag), value)
+                    for tag, value in exif.items())
+
+    def thumbnail_box(self, w, h, max_size):
+        """Return the bounding box an image of size w×h is shrunk into."""
+        # Panoramas get larger thumbnails because they look *awful*
+        if w > 2 * h:
+            return min(w, max_size * 4), min(w, max_size * 4)
+        return max_size, max_size
+
+    def resize_image(self, src, dst, max_size):
+        """Make a copy of the image in the requested size."""
+        self.resize_image_variants(src, [(dst, max_size)])
+
+    def resize_image_variants(self, src, variants, progressive_jpeg=False, copy_strategy='copy'):
+        """Make copies of the image in several sizes, decoding it only once.
+
+        variants is a list of (dst, max_size) pairs. Images that already
+        fit in max_size are copied unchanged, unless dst is in another
+        format (like a .webp copy of a JPEG). If progressive_jpeg is True,
+        resized JPEGs are saved as progressive JPEGs. copy_strategy is
+        passed to utils.copy_file for the copies.
+        """
+        if not Image:
+            for dst, max_size in variants:
+                utils.copy_file(src, dst, strategy=copy_strategy)
+            return
+        im = Image.open(src)
+        w, h = im.size
+        pending = []
+        src_ext = os.path.splitext(src)[1].lower()
+        for dst, max_size in variants:
+            if w > max_size or h > max_size:
+                pending.append((self.thumbnail_box(w, h, max_size), dst))
+            elif os.path.splitext(dst)[1].lower() != src_ext:
+                # Image is small, but must be converted
+                pending.append(((max(w, h), max(w, h)), dst))
+            else:  # Image is small
+                utils.copy_file(src, dst, strategy=copy_strategy)
+        if not pending:
+            return
+
+        # Largest first, so every size is scaled down from the previous one
+        pending.sort(reverse=True)
+        exif = self.get_exif(im)
+        self.remember_date(src, exif)
+        written = []
+        try:
+            if im.format == 'JPEG':
+                # Let the JPEG decoder skip detail the largest size can't use
+                im.draft(im.mode, pending[0][0])
+            transpose = EXIF_ORIENTATIONS.get(exif.get('Orientation'))
+            if transpose:
+                im = im.transpose(getattr(Image, transpose))
+            resample = getattr(Image, 'LANCZOS', None) or Image.ANTIALIAS
+            for box, dst in pending:
+                im.thumbnail(box, resample)
+                if os.path.lexists(dst):
+                    # It may be a hard link to src (see COPY_STRATEGY)
+                    os.unlink(dst)
+                try:
+                    if progressive_jpeg and os.path.splitext(dst)[1].lower() in ('.jpg', '.jpeg'):
+                        im.save(dst, progressive=True)
+                    else:
+                        im.save(dst)
+                except Exception as e:  # Like a format Pillow can't write
+                    self.logger.warn("Can't save {0} ({1})".format(dst, e))
+                    if os.path.lexists(dst):
+                        os.unlink(dst)  # Don't leave half-written files around
+                    continue
+                written.append(dst)
+        except Exception as e:
+            for box, dst in pending:
+                if dst not in written:
+                    self.logger.warn("Can't thumbnail {0}, using original "
+                                     "image as thumbnail ({1})".format(src, e))
+                    utils.copy_file(src, dst, strategy=copy_strategy)
+
+    def exif_date(self, exif):
+        """Return the EXIF date of an image as a datetime, or None."""
+        try:
+            return datetime.datetime.strptime(
+                exif['DateTimeOriginal'], r'%Y:%m:%d %H:%M:%S')
+        except (KeyError, TypeError, ValueError):  # Missing or invalid EXIF date.
+            return None
+
+    def remember_date(self, src, exif):
+        """Store the EXIF date of the image, if it has a valid one."""
+        date = self.exif_date(exif)
+        if date is not None:
+            self.dates.setdefault(src, date)
+
+    def image_info(self, path, cache=None):
+        """Return the size, EXIF orientation and EXIF date of an image.
+
+        If cache (a utils.PersistentCache) is given, the data is kept
+        there and the image is not opened again while it is unchanged.
+        """
+        signature = utils.file_signature(path)
+        info = cache.get(path, signature) if cache is not None else None
+        if info is None:
+            info = {'size': None, 'orientation': None, 'date': None}
+            try:
+                im = Image.open(path)
+                exif = self.get_exif(im)
+                info['size'] = list(im.size)
+                info['orientation'] = exif.get('Orientation')
+                date = self.exif_date(exif)
+                if date is not None:
+                    info['date'] = date.strftime(r'%Y-%m-%d %H:%M:%S')
+            except Exception:
+                pass
+            if cache is not None:
+                cache.set(path, signature, info)
+        return info
+
+    def image_date(self, src, cache=None):
+        """Try to figure out the date of the image."""
+        if src not in self.dates:
+            date = self.image_info(src, cache)['date']
+            if date:
+                self.dates[src] = datetime.datetime.strptime(date, r'%Y-%m-%d %H:%M:%S')
+            else:
+                self.dates[src] = datetime.datetime.fromtimestamp(
+                    os.stat(src).st_mtime)
+        return self.dates[src]
@@ -25,28 +25,26 @@
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 from __future__ import print_function, unicode_literals
-import codecs
 from collections import defaultdict
 from copy import copy
-import datetime
 import glob
 import locale
+import multiprocessing
 import os
 import sys
 try:
-    from urlparse import urlparse, urlsplit, urljoin
+    from urlparse import urlparse, urlsplit, urlunsplit, urljoin
 except ImportError:
-    from urllib.parse import urlparse, urlsplit, urljoin  # NOQA
+    from urllib.parse import urlparse, urlsplit, urlunsplit, urljoin  # NOQA
 
 from blinker import signal
 try:
     import pyphen
 except ImportError:
     pyphen = None
-import pytz
 
 import logging
-from . import DEBUG
+from . import DEBUG, __version__
 
 if DEBUG:
     logging.basicConfig(level=logging.DEBUG)
@@ -56,8 +54,8 @@ else:
 import lxml.html
 from yapsy.PluginManager import PluginManager
 
-from .post import Post
-from . import utils
+from .post import Post, get_post_metadata
+from . import feeds, utils
 from .plugin_categories import (
     Command,
     LateTask,
@@ -80,6 +78,11 @@ __all__ = ['Nikola']
 DEFAULT_TRANSLATIONS_PATTERN = '{path}.{ext}.{lang}'
 
 
+def _get_post_metadata(args):
+    """Call get_post_metadata with a tuple of arguments, for Pool.map."""
+    return get_post_metadata(*args)
+
+
 class Nikola(object):
 
     """Class that handles site generation.
@@ -111,6 +114,16 @@ class Nikola(object):
         self.posts_per_tag = defaultdict(list)
         self.posts_per_category = defaultdict(list)
         self.post_per_file = {}
+        self.task_targets = {}
+        self.source_translations = {}
+        self._slug_index = {}
+        self._filename_index = {}
+        self._path_warnings = set([])
+        self.html_processors = []
+        self._url_cache = utils.LRUCache(10000)
+        self._feed_item_cache = utils.LRUCache(10000)
+        self._feed_windows = {}
+        self._url_src = (None, None, None)
         self.timeline = []
         self.pages = []
         self._scanned = False
@@ -135,10 +148,12 @@ class Nikola(object):
             'ADD_THIS_BUTTONS': True,
             'ANNOTATIONS': False,
             'ARCHIVE_PATH': "",
+            'ASSET_FINGERPRINTS': False,
             'ARCHIVE_FILENAME': "archive.html",
             'BLOG_TITLE': 'Default Title',
             'BLOG_DESCRIPTION': 'Default Description',
             'BODY_END': "",
+            'BROTLI_FILES': False,
             'CACHE_FOLDER': 'cache',
             'CODE_COLOR_SCHEME': 'default',
             'COMMENT_SYSTEM': 'disqus',
@@ -155,6 +170,7 @@ class Nikola(object):
                 "html": ('.html', '.htm')
             },
             'CONTENT_FOOTER': '',
+            'COPY_STRATEGY': 'copy',
             'COPY_SOURCES': True,
             'CREATE_MONTHLY_ARCHIVE': False,
             'CREATE_SINGLE_ARCHIVE': False,
@@ -167,13 +183,21 @@ class Nikola(object):
             'ENABLED_EXTRAS': (),
             'EXTRA_HEAD_DATA': '',
             'FAVICONS': {},
+            'FEED_FORMATS': ('rss',),
             'FEED_LENGTH': 10,
             'FILE_METADATA_REGEXP': None,
             'ADDITIONAL_METADATA': {},
             'FILES_FOLDERS': {'files': ''},
             'FILTERS': {},
+            'GALLERY_LAZY_PHOTO_ARRAY': False,
+            'GALLERY_PAGE_SIZE': None,
             'GALLERY_PATH': 'galleries',
+            'GALLERY_PROGRESSIVE_JPEG': False,
             'GALLERY_SORT_BY_DATE': True,
+            'GALLERY_SRCSET_SIZES': [],
+            'GALLERY_WEBP': False,
+            'GALLERY_WORKER_PROCESSES': None,
+            'PARALLEL_GALLERIES': False,
             'GZIP_COMMAND': None,
             'GZIP_FILES': False,
             'GZIP_EXTENSIONS': ('.txt', '.htm', '.html', '.css', '.js', '.json', '.xml'),
@@ -216,7 +240,7 @@ class Nikola(object):
             'SITE_URL': 'http://getnikola.com/',
             'STORY_INDEX': False,
             'STRIP_INDEXES': False,
-            'SITEMAP_INCLUDE_FILELESS_DIRS': True,
+            'SITEMAP_URLS_PER_FILE': 50000,
             'TAG_PATH': 'categories',
             'TAG_PAGES_ARE_INDEXES': False,
             'TEMPLATE_FILTERS': {},
@@ -228,6 +252,10 @@ class Nikola(object):
             'USE_BUNDLES': True,
             'USE_CDN': False,
             'USE_FILENAME_AS_TITLE': True,
+            'USE_SCAN_CACHE': True,
+            'PARALLEL_SCAN': False,
+            'PARALLEL_COMPILE': False,
+            'WORKER_PROCESSES': None,
             'TIMEZONE': 'UTC',
             'DEPLOY_DRAFTS': True,
             'DEPLOY_FUTURE': False,
@@ -389,6 +417,11 @@ class Nikola(object):
         if self.config['BASE_URL'] and self.config['BASE_URL'][-1] != '/':
             utils.LOGGER.warn("Your BASE_URL doesn't end in / -- adding it.")
 
+        unknown_formats = [f for f in self.config['FEED_FORMATS'] if f not in feeds.WRITERS]
+        if unknown_formats:
+            utils.LOGGER.warn('Ignoring unknown FEED_FORMATS: {0}'.format(', '.join(unknown_formats)))
+            self.config['FEED_FORMATS'] = [f for f in self.config['FEED_FORMATS'] if f in feeds.WRITERS]
+
         self.plugin_manager = PluginManager(categories_filter={
             "Command": Command,
             "Task": Task,
@@ -518,6 +551,10 @@ class Nikola(object):
             'CONTENT_FOOTER')
         self._GLOBAL_CONTEXT['rss_path'] = self.config.get('RSS_PATH')
         self._GLOBAL_CONTEXT['rss_link'] = self.config.get('RSS_LINK')
+        self._GLOBAL_CONTEXT['feed_formats'] = [
+            (feed_format, feeds.WRITERS[feed_format].mimetype, feeds.WRITERS[feed_format].label)
+            for feed_format in self.config['FEED_FORMATS']]
+        self._GLOBAL_CONTEXT['feed_link'] = feeds.feed_path
 
         self._GLOBAL_CONTEXT['navigation_links'] = utils.Functionary(list, self.config['DEFAULT_LANG'])
         for k, v in self.config.get('NAVIGATION_LINKS', {}).items():
@@ -600,9 +637,24 @@ class Nikola(object):
                 self._GLOBAL_CONTEXT['has_custom_css'] = True
             else:
                 self._GLOBAL_CONTEXT['has_custom_css'] = False
+        if 'asset_fingerprints' not in self._GLOBAL_CONTEXT:
+            self._GLOBAL_CONTEXT['asset_fingerprints'] = self._get_asset_fingerprints()
 
         return self._GLOBAL_CONTEXT
 
+    def _get_asset_fingerprints(self):
+        """Return the fingerprinted names of assets, if ASSET_FINGERPRINTS is enabled."""
+        if not self.config['ASSET_FINGERPRINTS']:
+            return {}
+        if self.config['USE_BUNDLES']:
+            bundles = utils.get_theme_bundles(self.THEMES)
+        else:
+            bundles = {}
+        return utils.get_asset_fingerprints(
+            self.THEMES, self.config['FILES_FOLDERS'], ('.css', '.js'),
+            self.config['FILTERS'], bundles,
+            {os.path.join('assets', 'css', 'code.css'): self.config['CODE_COLOR_SCHEME']})
+
     GLOBAL_CONTEXT = property(_get_global_context)
 
     def _get_template_system(self):
@@ -658,7 +710,23 @@ class Nikola(object):
 
         return compile_html
 
-    def render_template(self, template_name, output_name, context):
+    def register_html_processor(self, processor):
+        """Register a function to process every page rendered from a template.
+
+        Processors are called as ``processor(doc, context)``, where doc is
+        the page as an lxml document, after links have been rewritten.
+        They must modify doc in place.
+        """
+        self.html_processors.append(processor)
+
+    def render_template(self, template_name, output_name, context, filters=None):
+        """Render a template, process the page and write it to output_name.
+
+        The page is parsed once; links are rewritten, and registered HTML
+        processors are applied, on the same document. ``filters`` is a list
+        of functions applied to the serialized page before it is written
+        (see utils.apply_filters).
+        """
         local_context = {}
         local_context["template_name"] = template_name
         local_context.update(self.GLOBAL_CONTEXT)
@@ -682,10 +750,19 @@ class Nikola(object):
         utils.makedirs(os.path.dirname(output_name))
         doc = lxml.html.document_fromstring(data)
         doc.rewrite_links(lambda dst: self.url_replacer(src, dst, context['lang']))
+        for processor in self.html_processors:
+            processor(doc, context)
         data = b'<!DOCTYPE html>' + lxml.html.tostring(doc, encoding='utf8')
+        for f in filters or []:
+            data = f(data)
         with open(output_name, "wb+") as post_file:
             post_file.write(data)
 
+    # utils.apply_filters can pass file filters to render_template
+    render_template.accepts_filters = True
+    # The sitemap lists pages and feeds without reading them
+    render_template.writes_page = True
+
     def url_replacer(self, src, dst, lang=None):
         """URL mangler.
 
@@ -700,58 +777,106 @@ class Nikola(object):
         lang is used for language-sensitive URLs in link://
 
         """
-        parsed_src = urlsplit(src)
-        src_elems = parsed_src.path.split('/')[1:]
-        dst_url = urlparse(dst)
         if lang is None:
             lang = self.default_lang
+        url_type = self.config.get('URL_TYPE')
+
+        # Links that depend on the file name of src (like "" or "?foo")
+        # are not cached; everything else only depends on its directory,
+        # except for links to src itself.
+        key = None
+        if dst and dst[0] not in '?;':
+            key = (src.rsplit('/', 1)[0], dst, lang, url_type)
+            cached = self._url_cache.get(key)
+            if cached is not None:
+                normalized, result = cached
+                if normalized != src:
+                    return result
+
+        normalized, result = self._replace_url(src, dst, lang, url_type)
+        if key is not None and normalized != src:
+            self._url_cache.set(key, (normalized, result))
+        return result
+
+    def _split_src(self, src):
+        """Split src for url_replacer, reusing the result for the same page."""
+        # Read and replace the memo only through a local: with doit's
+        # thread executor, other threads replace it for their own pages.
+        url_src = self._url_src
+        if url_src[0] != src:
+            parsed_src = urlsplit(src)
+            url_src = (src, parsed_src, parsed_src.path.split('/')[1:])
+            self._url_src = url_src
+        return url_src[1:]
+
+    def _replace_url(self, src, dst, lang, url_type):
+        """Do the work of url_replacer.
+
+        Returns a tuple (normalized dst, result). The normalized dst is
+        None if the result doesn't depend on src.
+        """
+        parsed_src, src_elems = self._split_src(src)
+        dst_url = urlparse(dst)
 
         # Refuse to replace links that are full URLs.
         if dst_url.netloc:
             if dst_url.scheme == 'link':  # Magic link
                 dst = self.link(dst_url.netloc, dst_url.path.lstrip('/'), lang)
             else:
-                return dst
+                return None, dst
         elif dst_url.scheme == 'link':  # Magic absolute path link:
             dst = dst_url.path
-            return dst
+            return None, dst
 
         # Refuse to replace links that consist of a fragment only
         if ((not dst_url.scheme) and (not dst_url.netloc) and
                 (not dst_url.path) and (not dst_url.params) and
                 (not dst_url.query) and dst_url.fragment):
-            return dst
+            return None, dst
 
         # Normalize
         dst = urljoin(src, dst)
+        normalized = dst
+
+        # Use fingerprinted names for assets (ASSET_FINGERPRINTS)
+        fingerprints = self.GLOBAL_CONTEXT['asset_fingerprints']
+        if fingerprints:
+            parsed_dst = urlsplit(dst)
+            if parsed_dst.netloc:  # Full URL (like in feeds), BASE_URL is the root
+                root = urlsplit(self.config['BASE_URL']).path
+            else:  # Relative to the output folder
+                root = '/'
+            asset = parsed_dst.path[len(root):]
+            if parsed_dst.path.startswith(root) and asset in fingerprints:
+                dst = urlunsplit(parsed_dst[:2] + (root + fingerprints[asset],) + parsed_dst[3:])
 
         # Avoid empty links.
         if src == dst:
-            if self.config.get('URL_TYPE') == 'absolute':
+            if url_type == 'absolute':
                 dst = urljoin(self.config['BASE_URL'], dst.lstrip('/'))
-                return dst
-            elif self.config.get('URL_TYPE') == 'full_path':
+                return normalized, dst
+            elif url_type == 'full_path':
                 dst = urljoin(self.config['BASE_URL'], dst.lstrip('/'))
-                return urlparse(dst).path
+                return normalized, urlparse(dst).path
             else:
-                return "#"
+                return normalized, "#"
 
         # Check that link can be made relative, otherwise return dest
         parsed_dst = urlsplit(dst)
         if parsed_src[:2] != parsed_dst[:2]:
-            if self.config.get('URL_TYPE') == 'absolute':
+            if url_type == 'absolute':
                 dst = urljoin(self.config['BASE_URL'], dst)
-            return dst
+            return normalized, dst
 
-        if self.config.get('URL_TYPE') in ('full_path', 'absolute'):
+        if url_type in ('full_path', 'absolute'):
             dst = urljoin(self.config['BASE_URL'], dst.lstrip('/'))
-            if self.config.get('URL_TYPE') == 'full_path':
+            if url_type == 'full_path':
                 parsed = urlparse(urljoin(self.config['BASE_URL'], dst.lstrip('/')))
                 if parsed.fragment:
                     dst = '{0}#{1}'.format(parsed.path, parsed.fragment)
                 else:
                     dst = parsed.path
-            return dst
+            return normalized, dst
 
         # Now both paths are on the same site and absolute
         dst_elems = parsed_dst.path.split('/')[1:]
@@ -772,65 +897,142 @@ class Nikola(object):
 
         assert result, (src, dst, i, src_elems, dst_elems)
 
-        return result
+        return normalized, result
+
+    def report_stats(self):
+        """Log statistics about the caches used during the build."""
+        for name, cache in (('url_replacer', self._url_cache), ('feed item', self._feed_item_cache)):
+            total = cache.hits + cache.misses
+            if total:
+                utils.LOGGER.info('{0} cache: {1} hits, {2} misses ({3:.1f}% hit rate)'.format(
+                    name, cache.hits, cache.misses, 100.0 * cache.hits / total))
+
+    @staticmethod
+    def _is_fixed_link(link):
+        """Tell if url_replacer leaves link unchanged, wherever it is used."""
+        parsed = urlparse(link)
+        if parsed.scheme == 'link':
+            return False
+        if parsed.netloc or parsed.scheme not in ('', 'http', 'https'):
+            return True
+        return not (parsed.scheme or parsed.path or parsed.params or parsed.query)
+
+    def feed_item_text(self, post, lang, rss_teasers, feed_url=None):
+        """Return the HTML of post for a feed item, with links fixed for feed_url.
+
+        Results are kept for the whole build, keyed by post, lang, teaser
+        mode and the signature of the compiled fragment, and are shared by
+        all feeds (the main feed, tag and category feeds), unless the
+        post has links (like link://) that depend on where the feed is.
+        """
+        signature = (utils.file_signature(post.translated_base_path(lang)) or
+                     utils.file_signature(post.base_path) or [])
+        key = (post.source_path, lang, rss_teasers, tuple(signature))
+        if feed_url is None:
+            variants = (None,)
+        else:
+            variants = ('', feed_url)
+        for variant in variants:
+            data = self._feed_item_cache.get(key + (variant,))
+            if data is not None:
+                return data
+
+        # Massage the post's HTML
+        data = post.text(lang, teaser_only=rss_teasers, really_absolute=True)
+        variant = None if feed_url is None else ''
+        if feed_url is not None and data:
+            # FIXME: this is duplicated with code in Post.text()
+            try:
+                doc = lxml.html.document_fromstring(data)
+                if not all(self._is_fixed_link(link) for _, _, link, _ in doc.iterlinks()):
+                    variant = feed_url
+                doc.rewrite_links(lambda dst: self.url_replacer(feed_url, dst, lang))
+                try:
+                    body = doc.body
+                    data = (body.text or '') + ''.join(
+                        [lxml.html.tostring(child, encoding='unicode')
+                            for child in body.iterchildren()])
+                except IndexError:  # No body there, it happens sometimes
+                    data = ''
+            except lxml.etree.ParserError as e:
+                if str(e) == "Document is empty":
+                    data = ""
+                else:  # let other errors raise
+                    raise(e)
+        self._feed_item_cache.set(key + (variant,), data)
+        return data
+
+    def feed_paths(self, output_path):
+        """Return a dict mapping each format in FEED_FORMATS to its path.
+
+        output_path is the path (or URL) of the RSS version of the feed;
+        the others are next to it (rss.atom, rss.json).
+        """
+        return dict((feed_format, feeds.feed_path(output_path, feed_format))
+                    for feed_format in self.config['FEED_FORMATS'])
+
+    def feed_window(self, lang, kind=None, name=None):
+        """Return the posts that go in a feed in lang, newest first.
+
+        kind is None for the main feed, or 'tag' / 'category' for the
+        feed of the tag or category called name.  A window holds at most
+        FEED_LENGTH posts used in feeds (and translated to lang, if
+        HIDE_UNTRANSLATED_POSTS is set).  All the windows of a language
+        are built together in a single pass over the timeline.
+        """
+        if lang not in self._feed_windows:
+            self._feed_windows[lang] = self._build_feed_windows(lang)
+        return self._feed_windows[lang].get((kind, name), [])
+
+    def _build_feed_windows(self, lang):
+        """Build every feed window of lang (see feed_window)."""
+        self.scan_posts()
+        feed_length = self.config['FEED_LENGTH']
+        hide_untranslated = self.config['HIDE_UNTRANSLATED_POSTS']
+        windows = defaultdict(list)
+        for post in self.timeline:
+            if not post.use_in_feeds:
+                continue
+            if hide_untranslated and not post.is_translation_available(lang):
+                continue
+            keys = [(None, None), ('category', post.meta('category'))]
+            keys.extend(('tag', tag) for tag in post.alltags)
+            for key in keys:
+                window = windows[key]
+                if len(window) < feed_length:
+                    window.append(post)
+        return dict(windows)
 
     def generic_rss_renderer(self, lang, title, link, description, timeline, output_path,
                              rss_teasers, feed_length=10, feed_url=None):
-        """Takes all necessary data, and renders a RSS feed in output_path."""
+        """Takes all necessary data, and renders a RSS feed in output_path.
+
+        Atom and JSON Feed versions are written too, if they are in
+        FEED_FORMATS (see feed_paths).  Feeds are only written if they
+        changed.
+        """
         items = []
         for post in timeline[:feed_length]:
-            # Massage the post's HTML
-            data = post.text(lang, teaser_only=rss_teasers, really_absolute=True)
-            if feed_url is not None and data:
-                # FIXME: this is duplicated with code in Post.text()
-                try:
-                    doc = lxml.html.document_fromstring(data)
-                    doc.rewrite_links(lambda dst: self.url_replacer(feed_url, dst, lang))
-                    try:
-                        body = doc.body
-                        data = (body.text or '') + ''.join(
-                            [lxml.html.tostring(child, encoding='unicode')
-                                for child in body.iterchildren()])
-                    except IndexError:  # No body there, it happens sometimes
-                        data = ''
-                except lxml.etree.ParserError as e:
-                    if str(e) == "Document is empty":
-                        data = ""
-                    else:  # let other errors raise
-                        raise(e)
-
-            args = {
+            items.append({
                 'title': post.title(lang),
                 'link': post.permalink(lang, absolute=True),
-                'description': data,
+                'description': self.feed_item_text(post, lang, rss_teasers, feed_url),
                 'guid': post.permalink(lang, absolute=True),
-                # PyRSS2Gen's pubDate is GMT time.
-                'pubDate': (post.date if post.date.tzinfo is None else
-                            post.date.astimezone(pytz.timezone('UTC'))),
+                'date': post.date,
                 'categories': post._tags.get(lang, []),
                 'author': post.meta('author'),
-            }
-
-            items.append(utils.ExtendedItem(**args))
-        rss_obj = utils.ExtendedRSS2(
-            title=title,
-            link=link,
-            description=description,
-            lastBuildDate=datetime.datetime.now(),
-            items=items,
-            generator='Nikola <http://getnikola.com/>',
-            language=lang
-        )
-        rss_obj.self_url = feed_url
-        rss_obj.rss_attrs["xmlns:atom"] = "http://www.w3.org/2005/Atom"
-        rss_obj.rss_attrs["xmlns:dc"] = "http://purl.org/dc/elements/1.1/"
-        dst_dir = os.path.dirname(output_path)
-        utils.makedirs(dst_dir)
-        with codecs.open(output_path, "wb+", "utf-8") as rss_file:
-            data = rss_obj.to_xml(encoding='utf-8')
-            if isinstance(data, utils.bytes_str):
-                data = data.decode('utf-8')
-            rss_file.write(data)
+            })
+        blog_author = self.config.get('BLOG_AUTHOR')
+        feeds.write_feeds(self.feed_paths(output_path), {
+            'title': title,
+            'link': link,
+            'description': description,
+            'feed_url': feed_url,
+            'language': lang,
+            'author': blog_author(lang) if blog_author else None,
+        }, items)
+
+    generic_rss_renderer.writes_feed = True
 
     def path(self, kind, name, lang=None, is_link=False):
         """Build the path to a certain kind of page.
@@ -890,24 +1092,48 @@ class Nikola(object):
 
     def slug_path(self, name, lang):
         """slug path handler"""
-        results = [p for p in self.timeline if p.meta('slug') == name]
+        current_lang = utils.LocaleBorg().current_lang
+        if current_lang in self._slug_index:
+            results = self._slug_index[current_lang].get(name)
+        else:
+            results = [p for p in self.timeline if p.meta('slug') == name]
         if not results:
             utils.LOGGER.warning("Can't resolve path request for slug: {0}".format(name))
         else:
-            if len(results) > 1:
+            if len(results) > 1 and ('slug', current_lang, name) not in self._path_warnings:
+                self._path_warnings.add(('slug', current_lang, name))
                 utils.LOGGER.warning('Ambiguous path request for slug: {0}'.format(name))
             return [_f for _f in results[0].permalink(lang).split('/') if _f]
 
     def filename_path(self, name, lang):
         """filename path handler"""
-        results = [p for p in self.timeline if p.source_path == name]
+        results = self._filename_index.get(name)
         if not results:
             utils.LOGGER.warning("Can't resolve path request for filename: {0}".format(name))
         else:
-            if len(results) > 1:
+            if len(results) > 1 and ('filename', name) not in self._path_warnings:
+                self._path_warnings.add(('filename', name))
                 utils.LOGGER.error("Ambiguous path request for filename: {0}".format(name))
             return [_f for _f in results[0].permalink(lang).split('/') if _f]
 
+    def _index_posts(self):
+        """Build the slug and filename indexes used by the path handlers.
+
+        Posts are indexed in timeline order, so the first post for each
+        name is the one the handlers link to.
+        """
+        self._slug_index = {}
+        for lang in self.config['TRANSLATIONS']:
+            index = defaultdict(list)
+            for p in self.timeline:
+                index[p.meta[lang]['slug']].append(p)
+            self._slug_index[lang] = dict(index)
+        index = defaultdict(list)
+        for p in self.timeline:
+            index[p.source_path].append(p)
+        self._filename_index = dict(index)
+        self._path_warnings = set([])
+
     def register_path_handler(self, kind, f):
         if kind in self.path_handlers:
             utils.LOGGER.warning('Conflicting path handlers for kind: {0}'.format(kind))
@@ -958,10 +1184,12 @@ class Nikola(object):
         return exists
 
     def clean_task_paths(self, task):
-        """Normalize target paths in the task."""
+        """Normalize target paths in the task, and remember them in task_targets."""
         targets = task.get('targets', None)
         if targets is not None:
             task['targets'] = [os.path.normpath(t) for t in targets]
+            for target in task['targets']:
+                self.task_targets[target] = task
         return task
 
     def gen_tasks(self, name, plugin_category, doc=''):
@@ -1005,6 +1233,12 @@ class Nikola(object):
         print("Scanning posts", end='', file=sys.stderr)
         slugged_tags = set([])
         quit = False
+        scan_cache = None
+        if self.config['USE_SCAN_CACHE']:
+            scan_cache = utils.PersistentCache(
+                os.path.join(self.config['CACHE_FOLDER'], 'scan_cache.json'),
+                self._scan_cache_digest())
+        candidates = []
         for wildcard, destination, template_name, use_in_feeds in \
                 self.config['post_pages']:
             print(".", end='', file=sys.stderr)
@@ -1013,23 +1247,19 @@ class Nikola(object):
                 dir_glob = os.path.join(dirpath, os.path.basename(wildcard))
                 dest_dir = os.path.normpath(os.path.join(destination,
                                             os.path.relpath(dirpath, dirname)))
-                full_list = glob.glob(dir_glob)
+                found = set(glob.glob(dir_glob))
                 # Now let's look for things that are not in default_lang
                 for lang in self.config['TRANSLATIONS'].keys():
                     lang_glob = utils.get_translation_candidate(self.config, dir_glob, lang)
-                    translated_list = glob.glob(lang_glob)
-                    # dir_glob could have put it already in full_list
-                    full_list = list(set(full_list + translated_list))
+                    # dir_glob could have put them already in found
+                    found.update(glob.glob(lang_glob))
 
-                # Eliminate translations from full_list if they are not the primary,
+                # Eliminate translations from the list if they are not the primary,
                 # or a secondary with no primary
-                limited_list = full_list[:]
-                for fname in full_list:
-                    for lang in self.config['TRANSLATIONS'].keys():
-                        translation = utils.get_translation_candidate(self.config, fname, lang)
-                        if translation in full_list:
-                            limited_list.remove(translation)
-                full_list = limited_list
+                full_list = []
+                for fname, translations in sorted(self.group_translations(found).items()):
+                    full_list.append(fname)
+                    self.source_translations[fname] = translations
 
                 # We eliminate from the list the files inside any .ipynb folder
                 full_list = [p for p in full_list
@@ -1041,39 +1271,44 @@ class Nikola(object):
                         continue
                     else:
                         seen.add(base_path)
-                    post = Post(
-                        base_path,
-                        self.config,
-                        dest_dir,
-                        use_in_feeds,
-                        self.MESSAGES,
-                        template_name,
-                        self.get_compiler(base_path)
-                    )
-                    self.global_data[post.source_path] = post
-                    if post.use_in_feeds:
-                        self.posts.append(post.source_path)
-                        self.posts_per_year[
-                            str(post.date.year)].append(post.source_path)
-                        self.posts_per_month[
-                            '{0}/{1:02d}'.format(post.date.year, post.date.month)].append(post.source_path)
-                        for tag in post.alltags:
-                            if utils.slugify(tag) in slugged_tags:
-                                if tag not in self.posts_per_tag:
-                                    # Tags that differ only in case
-                                    other_tag = [k for k in self.posts_per_tag.keys() if k.lower() == tag.lower()][0]
-                                    utils.LOGGER.error('You have tags that are too similar: {0} and {1}'.format(tag, other_tag))
-                                    utils.LOGGER.error('Tag {0} is used in: {1}'.format(tag, post.source_path))
-                                    utils.LOGGER.error('Tag {0} is used in: {1}'.format(other_tag, ', '.join(self.posts_per_tag[other_tag])))
-                                    quit = True
-                            else:
-                                slugged_tags.add(utils.slugify(tag))
-                            self.posts_per_tag[tag].append(post.source_path)
-                        self.posts_per_category[post.meta('category')].append(post.source_path)
+                    candidates.append((base_path, dest_dir, template_name, use_in_feeds))
+
+        metadata = self._read_post_metadata([c[0] for c in candidates], scan_cache)
+        for base_path, dest_dir, template_name, use_in_feeds in candidates:
+            post = Post(
+                base_path,
+                self.config,
+                dest_dir,
+                use_in_feeds,
+                self.MESSAGES,
+                template_name,
+                self.get_compiler(base_path),
+                metadata[base_path]
+            )
+            self.global_data[post.source_path] = post
+            if post.use_in_feeds:
+                self.posts.append(post.source_path)
+                self.posts_per_year[
+                    str(post.date.year)].append(post.source_path)
+                self.posts_per_month[
+                    '{0}/{1:02d}'.format(post.date.year, post.date.month)].append(post.source_path)
+                for tag in post.alltags:
+                    if utils.slugify(tag) in slugged_tags:
+                        if tag not in self.posts_per_tag:
+                            # Tags that differ only in case
+                            other_tag = [k for k in self.posts_per_tag.keys() if k.lower() == tag.lower()][0]
+                            utils.LOGGER.error('You have tags that are too similar: {0} and {1}'.format(tag, other_tag))
+                            utils.LOGGER.error('Tag {0} is used in: {1}'.format(tag, post.source_path))
+                            utils.LOGGER.error('Tag {0} is used in: {1}'.format(other_tag, ', '.join(self.posts_per_tag[other_tag])))
+                            quit = True
                     else:
-                        self.pages.append(post)
-                    self.post_per_file[post.destination_path(lang=lang)] = post
-                    self.post_per_file[post.destination_path(lang=lang, extension=post.source_ext())] = post
+                        slugged_tags.add(utils.slugify(tag))
+                    self.posts_per_tag[tag].append(post.source_path)
+                self.posts_per_category[post.meta('category')].append(post.source_path)
+            else:
+                self.pages.append(post)
+            self.post_per_file[post.destination_path(lang=lang)] = post
+            self.post_per_file[post.destination_path(lang=lang, extension=post.source_ext())] = post
 
         for name, post in list(self.global_data.items()):
             self.timeline.append(post)
@@ -1084,11 +1319,102 @@ class Nikola(object):
             p.next_post = post_timeline[i]
         for i, p in enumerate(post_timeline[:-1]):
             p.prev_post = post_timeline[i + 1]
+        self._index_posts()
         self._scanned = True
         print("done!", file=sys.stderr)
+        if scan_cache is not None:
+            scan_cache.save(prune=True)
+            utils.LOGGER.info('Scan cache: {0} hits, {1} misses'.format(
+                scan_cache.hits, scan_cache.misses))
         if quit:
             sys.exit(1)
 
+    def group_translations(self, paths):
+        """Group source files with their translations.
+
+        Returns a dictionary mapping each file that is not a translation
+        of another one in paths to a dictionary {lang: path} of its
+        translations.
+        """
+        paths = set(paths)
+        langs = list(self.config['TRANSLATIONS'].keys())
+        groups = {}
+        secondary = set([])
+        for fname in paths:
+            translations = {}
+            for lang in langs:
+                translation = utils.get_translation_candidate(self.config, fname, lang)
+                if translation in paths:
+                    translations[lang] = translation
+                    secondary.add(translation)
+            groups[fname] = translations
+        for fname in secondary:
+            del groups[fname]
+        return groups
+
+    def _scan_cache_digest(self):
+        """Digest of the settings that affect the metadata stored in the scan cache."""
+        return config_changed({
+            'version': __version__,
+            'DEFAULT_LANG': self.config['DEFAULT_LANG'],
+            'FILE_METADATA_REGEXP': self.config['FILE_METADATA_REGEXP'],
+            'TRANSLATIONS': sorted(self.config['TRANSLATIONS'].keys()),
+            'TRANSLATIONS_PATTERN': self.config['TRANSLATIONS_PATTERN'],
+        })._calc_digest()
+
+    def _post_source_signature(self, source_path):
+        """Signatures of every file a post's metadata can be read from."""
+        meta_path = os.path.splitext(source_path)[0] + '.meta'
+        translations = self.source_translations.get(source_path, {})
+        signature = [utils.file_signature(source_path), utils.file_signature(meta_path)]
+        for lang in sorted(self.config['TRANSLATIONS'].keys()):
+            if lang != self.config['DEFAULT_LANG']:
+                signature.append(utils.file_signature(translations[lang]) if lang in translations else None)
+                signature.append(utils.file_signature(
+                    utils.get_translation_candidate(self.config, meta_path, lang)))
+        return signature
+
+    def _read_post_metadata(self, paths, scan_cache=None):
+        """Read the metadata of many posts, as a dictionary indexed by path.
+
+        Posts found in the scan cache are not read again. If PARALLEL_SCAN
+        is enabled, the rest are read by a pool of worker processes.
+        """
+        metadata = {}
+        signatures = {}
+        missing = []
+        for path in paths:
+            if scan_cache is not None:
+                signatures[path] = self._post_source_signature(path)
+                metadata[path] = scan_cache.get(path, signatures[path])
+            if metadata.get(path) is None:
+                missing.append(path)
+
+        if self.config['PARALLEL_SCAN'] and len(missing) > 1:
+            # Only send the settings get_post_metadata needs; the full
+            # configuration can't be pickled.
+            config = dict((k, self.config[k]) for k in (
+                'DEFAULT_LANG', 'FILE_METADATA_REGEXP', 'TRANSLATIONS',
+                'TRANSLATIONS_PATTERN'))
+            processes = utils.get_worker_count(self.config)
+            pool = multiprocessing.Pool(processes)
+            try:
+                results = pool.map(_get_post_metadata, [
+                    (path, config, self.source_translations.get(path)) for path in missing],
+                    max(1, len(missing) // (processes * 4)))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [get_post_metadata(path, self.config, self.source_translations.get(path))
+                       for path in missing]
+
+        for path, data in zip(missing, results):
+            metadata[path] = data
+            if scan_cache is not None:
+                scan_cache.set(path, signatures[path], data)
+        return metadata
+
     def generic_page_renderer(self, lang, post, filters):
         """Render post fragments to final HTML pages."""
         context = {}
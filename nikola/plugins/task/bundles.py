@@ -35,6 +35,7 @@ except ImportError:
 
 from nikola.plugin_categories import LateTask
 from nikola import utils
+from nikola.utils import get_theme_bundles
 
 
 class BuildBundles(LateTask):
@@ -60,6 +61,7 @@ class BuildBundles(LateTask):
             'themes': self.site.THEMES,
             'files_folders': self.site.config['FILES_FOLDERS'],
             'code_color_scheme': self.site.config['CODE_COLOR_SCHEME'],
+            'asset_fingerprints': self.site.GLOBAL_CONTEXT['asset_fingerprints'],
         }
 
         def build_bundle(output, inputs):
@@ -99,20 +101,6 @@ class BuildBundles(LateTask):
                     'uptodate': [utils.config_changed(kw)],
                     'clean': True,
                 }
-                yield utils.apply_filters(task, kw['filters'])
-
-
-def get_theme_bundles(themes):
-    """Given a theme chain, return the bundle definitions."""
-    bundles = {}
-    for theme_name in themes:
-        bundles_path = os.path.join(
-            utils.get_theme_path(theme_name), 'bundles')
-        if os.path.isfile(bundles_path):
-            with open(bundles_path) as fd:
-                for line in fd:
-                    name, files = line.split('=')
-                    files = [f.strip() for f in files.split(',')]
-                    bundles[name.strip().replace('/', os.sep)] = files
-                break
-    return bundles
+                yield utils.add_fingerprinted_copy(
+                    utils.apply_filters(task, kw['filters']),
+                    kw['output_folder'], kw['asset_fingerprints'])
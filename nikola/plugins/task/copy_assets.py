@@ -25,6 +25,7 @@
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import codecs
+import json
 import os
 
 from nikola.plugin_categories import Task
@@ -48,6 +49,8 @@ class CopyAssets(Task):
             "output_folder": self.site.config['OUTPUT_FOLDER'],
             "filters": self.site.config['FILTERS'],
             "code_color_scheme": self.site.config['CODE_COLOR_SCHEME'],
+            "asset_fingerprints": self.site.GLOBAL_CONTEXT['asset_fingerprints'],
+            "copy_strategy": self.site.config['COPY_STRATEGY'],
         }
         has_code_css = False
         tasks = {}
@@ -58,7 +61,7 @@ class CopyAssets(Task):
         for theme_name in kw['themes']:
             src = os.path.join(utils.get_theme_path(theme_name), 'assets')
             dst = os.path.join(kw['output_folder'], 'assets')
-            for task in utils.copy_tree(src, dst):
+            for task in utils.copy_tree(src, dst, strategy=kw['copy_strategy']):
                 if task['name'] in tasks:
                     continue
                 if task['targets'][0] == code_css_path:
@@ -66,7 +69,9 @@ class CopyAssets(Task):
                 tasks[task['name']] = task
                 task['uptodate'] = [utils.config_changed(kw)]
                 task['basename'] = self.name
-                yield utils.apply_filters(task, kw['filters'])
+                yield utils.add_fingerprinted_copy(
+                    utils.apply_filters(task, kw['filters']),
+                    kw['output_folder'], kw['asset_fingerprints'])
 
         if not has_code_css:  # Generate it
 
@@ -86,4 +91,23 @@ class CopyAssets(Task):
                 'actions': [(create_code_css, [])],
                 'clean': True,
             }
-            yield utils.apply_filters(task, kw['filters'])
+            yield utils.add_fingerprinted_copy(
+                utils.apply_filters(task, kw['filters']),
+                kw['output_folder'], kw['asset_fingerprints'])
+
+        if kw['asset_fingerprints']:  # Write the manifest
+
+            def write_manifest():
+                utils.makedirs(os.path.dirname(manifest_path))
+                with codecs.open(manifest_path, 'wb+', 'utf8') as outf:
+                    outf.write(json.dumps(kw['asset_fingerprints'], indent=2, sort_keys=True))
+
+            manifest_path = os.path.join(kw['output_folder'], 'assets', 'manifest.json')
+            yield {
+                'basename': self.name,
+                'name': manifest_path,
+                'targets': [manifest_path],
+                'uptodate': [utils.config_changed(kw)],
+                'actions': [(write_manifest, [])],
+                'clean': True,
+            }
@@ -42,6 +42,7 @@ class CopyFiles(Task):
             'files_folders': self.site.config['FILES_FOLDERS'],
             'output_folder': self.site.config['OUTPUT_FOLDER'],
             'filters': self.site.config['FILTERS'],
+            'copy_strategy': self.site.config['COPY_STRATEGY'],
         }
 
         yield self.group_task()
@@ -49,7 +50,8 @@ class CopyFiles(Task):
             dst = kw['output_folder']
             filters = kw['filters']
             real_dst = os.path.join(dst, kw['files_folders'][src])
-            for task in utils.copy_tree(src, real_dst, link_cutoff=dst):
+            for task in utils.copy_tree(src, real_dst, link_cutoff=dst,
+                                        strategy=kw['copy_strategy']):
                 task['basename'] = self.name
                 task['uptodate'] = [utils.config_changed(kw)]
                 yield utils.apply_filters(task, filters)
@@ -26,39 +26,44 @@
 
 from __future__ import unicode_literals
 import codecs
-import datetime
-import glob
+import heapq
 import json
 import mimetypes
+import multiprocessing
 import os
+import shutil
+import time
 try:
     from urlparse import urljoin
 except ImportError:
     from urllib.parse import urljoin  # NOQA
 
-Image = None
-try:
-    from PIL import Image, ExifTags  # NOQA
-except ImportError:
-    try:
-        import Image as _Image
-        import ExifTags
-        Image = _Image
-    except ImportError:
-        pass
-import PyRSS2Gen as rss
-
 from nikola.plugin_categories import Task
-from nikola import utils
+from nikola import feeds, utils
+from nikola.image_processing import Image, ImageProcessor, webp_supported
 from nikola.post import Post
 from nikola.utils import req_missing
 
+# The (src, variants) jobs resized by the worker processes, and the plugin
+# doing it. Workers are forked, so they inherit both instead of receiving
+# pickled copies.
+_batch = []
+_processor = None
+
+
+def _resize_batch_item(i):
+    """Resize the i-th image of the current batch, in a worker process."""
+    src, variants = _batch[i]
+    start = time.time()
+    _processor.resize_image_variants(src, variants, _processor.kw['progressive_jpeg'],
+                                     _processor.copy_strategy(src))
+    return i, time.time() - start
 
-class Galleries(Task):
+
+class Galleries(Task, ImageProcessor):
     """Render image galleries."""
 
     name = 'render_galleries'
-    dates = {}
 
     def set_site(self, site):
         site.register_path_handler('gallery', self.gallery_path)
@@ -80,9 +85,13 @@ class Galleries(Task):
 
         if Image is None:
             req_missing(['pillow'], 'render galleries')
+        if self.site.config['GALLERY_WEBP'] and not webp_supported():
+            req_missing(['pillow (with WebP support)'], 'use GALLERY_WEBP', optional=True)
+            utils.LOGGER.warn('Setting GALLERY_WEBP to False.')
+            self.site.config['GALLERY_WEBP'] = False
 
         self.logger = utils.get_logger('render_galleries', self.site.loghandlers)
-        self.image_ext_list = ['.jpg', '.png', '.jpeg', '.gif', '.svg', '.bmp', '.tiff']
+        self.image_ext_list = self.image_ext_list_builtin[:]
         self.image_ext_list.extend(self.site.config.get('EXTRA_IMAGE_EXTENSIONS', []))
 
         self.kw = {
@@ -98,10 +107,29 @@ class Galleries(Task):
             'translations': self.site.config['TRANSLATIONS'],
             'global_context': self.site.GLOBAL_CONTEXT,
             "feed_length": self.site.config['FEED_LENGTH'],
+            'srcset_sizes': sorted(set(
+                size for size in self.site.config['GALLERY_SRCSET_SIZES']
+                if size < self.site.config['MAX_IMAGE_SIZE'])),
+            'webp': self.site.config['GALLERY_WEBP'],
+            'progressive_jpeg': self.site.config['GALLERY_PROGRESSIVE_JPEG'],
+            'page_size': self.site.config['GALLERY_PAGE_SIZE'],
+            'lazy_photo_array': self.site.config['GALLERY_LAZY_PHOTO_ARRAY'],
+            'index_file': self.site.config['INDEX_FILE'],
+            'copy_strategy': self.site.config['COPY_STRATEGY'],
         }
 
         yield self.group_task()
 
+        self.image_jobs = []
+        self.resized = {}
+        self.parallel = self.site.config['PARALLEL_GALLERIES'] and hasattr(os, 'fork')
+        if self.parallel:
+            yield {
+                'basename': self.name,
+                'name': '__batch__',
+                'actions': [(self.resize_batch, ())],
+            }
+
         template_name = "gallery.tmpl"
 
         # Find all galleries we need to process
@@ -115,8 +143,8 @@ class Galleries(Task):
         for gallery in self.gallery_list:
 
             # Create subfolder list
-            folder_list = [(x, x.split(os.sep)[-2]) for x in
-                           glob.glob(os.path.join(gallery, '*') + os.sep)]
+            folder_list = [(os.path.join(gallery, x), x)
+                           for x in self.gallery_dirs[gallery]]
 
             # Parse index into a post (with translations)
             post = self.parse_index(gallery)
@@ -124,13 +152,40 @@ class Galleries(Task):
             # Create image list, filter exclusions
             image_list = self.get_image_list(gallery)
 
-            # Sort as needed
+            # Image sizes and EXIF data, kept between builds
+            image_cache = utils.PersistentCache(os.path.normpath(os.path.join(
+                self.kw['cache_folder'], 'galleries',
+                os.path.relpath(gallery, self.kw['gallery_path']), 'metadata.json')))
+
+            # Sort as needed; images with the same date are sorted by
+            # name, so the order doesn't change from one build to the next
+            def date_key(img):
+                return (self.image_date(img, image_cache), img)
+
             # Sort by date
             if self.kw['sort_by_date']:
-                image_list.sort(key=lambda a: self.image_date(a))
+                image_list.sort(key=date_key)
             else:  # Sort by name
                 image_list.sort()
 
+            # The newest images, shown in the gallery feed
+            if self.kw['sort_by_date']:
+                feed_images = image_list[::-1][:self.kw['feed_length']]
+            else:
+                feed_images = heapq.nlargest(
+                    self.kw['feed_length'], image_list, key=date_key)
+            feed_dates = [self.image_date(img, image_cache) for img in feed_images]
+
+            # Every image was looked at, so entries for images that are
+            # gone can be dropped. Entries for output images are only
+            # used by the index pages that get rendered again.
+            output_images = []
+            for image in image_list:
+                dest = os.path.join(self.kw['output_folder'], image)
+                output_images.extend(path for path, max_size in self.image_targets(dest))
+            image_cache.keep(image_list + output_images)
+            image_cache.save(prune=True)
+
             # Create thumbnails and large images in destination
             for image in image_list:
                 for task in self.create_target_images(image):
@@ -208,29 +263,57 @@ class Galleries(Task):
                 else:
                     context['text'] = ''
 
-                file_dep = self.site.template_system.template_deps(
-                    template_name) + image_list + thumbs
-
-                yield utils.apply_filters({
-                    'basename': self.name,
-                    'name': dst,
-                    'file_dep': file_dep,
-                    'targets': [dst],
-                    'actions': [
-                        (self.render_gallery_index, (
-                            template_name,
-                            dst,
-                            context,
-                            dest_img_list,
-                            thumbs,
-                            file_dep))],
-                    'clean': True,
-                    'uptodate': [utils.config_changed({
-                        1: self.kw,
-                        2: self.site.config["COMMENTS_IN_GALLERIES"],
-                        3: context,
-                    })],
-                }, self.kw['filters'])
+                template_deps = self.site.template_system.template_deps(
+                    template_name)
+
+                # Split in pages of GALLERY_PAGE_SIZE images
+                page_size = self.kw['page_size'] or len(image_list) or 1
+                num_pages = max(1, (len(image_list) + page_size - 1) // page_size)
+                for i in range(num_pages):
+                    page = slice(i * page_size, (i + 1) * page_size)
+                    page_context = context.copy()
+                    page_dst = os.path.join(os.path.dirname(dst), self.page_name(i))
+                    if i > 0:
+                        page_context["permalink"] = urljoin(
+                            context["permalink"], self.page_name(i))
+                    page_context["images"] = context["images"][page]
+                    page_context["prevlink"] = self.page_name(i - 1) if i > 0 else None
+                    page_context["nextlink"] = (self.page_name(i + 1)
+                                                if i < num_pages - 1 else None)
+                    page_context["page_number"] = i + 1
+                    page_context["num_pages"] = num_pages
+
+                    page_file_dep = template_deps + image_list[page] + thumbs[page]
+                    if self.kw['srcset_sizes'] or self.kw['webp']:
+                        for img in dest_img_list[page]:
+                            page_file_dep += [path for path, max_size in self.image_targets(img)]
+                    targets = [page_dst]
+                    if self.kw['lazy_photo_array']:
+                        targets.append(os.path.splitext(page_dst)[0] + '.json')
+
+                    yield utils.apply_filters({
+                        'basename': self.name,
+                        'name': page_dst,
+                        'file_dep': page_file_dep,
+                        'targets': targets,
+                        'actions': [
+                            (self.render_gallery_index, (
+                                template_name,
+                                page_dst,
+                                page_context,
+                                dest_img_list[page],
+                                thumbs[page],
+                                page_file_dep,
+                                image_cache))],
+                        # Once, after every page that needed it is rendered
+                        'teardown': [(image_cache.save, ())],
+                        'clean': True,
+                        'uptodate': [utils.config_changed({
+                            1: self.kw,
+                            2: self.site.config["COMMENTS_IN_GALLERIES"],
+                            3: page_context,
+                        })],
+                    }, self.kw['filters'])
 
                 # RSS for the gallery
                 rss_dst = os.path.join(
@@ -240,33 +323,58 @@ class Galleries(Task):
                         os.path.relpath(gallery, self.kw['gallery_path']), lang))
                 rss_dst = os.path.normpath(rss_dst)
 
+                # Only the images in the feed matter to it
+                titles = dict(zip(image_list, img_titles))
+                feed_titles = [titles[img] for img in feed_images]
+                feed_dest = [os.path.join(self.kw['output_folder'], img)
+                             for img in feed_images]
+
                 yield utils.apply_filters({
                     'basename': self.name,
                     'name': rss_dst,
-                    'file_dep': file_dep,
-                    'targets': [rss_dst],
+                    'file_dep': feed_images + feed_dest,
+                    'targets': sorted(self.site.feed_paths(rss_dst).values()),
                     'actions': [
                         (self.gallery_rss, (
-                            image_list,
-                            img_titles,
+                            feed_images,
+                            feed_titles,
                             lang,
                             self.site.link(
                                 "gallery_rss", os.path.basename(gallery), lang),
                             rss_dst,
-                            context['title']
+                            context['title'],
+                            feed_dates,
                         ))],
                     'clean': True,
                     'uptodate': [utils.config_changed({
                         1: self.kw,
+                        2: [(img, str(date)) for img, date in zip(feed_images, feed_dates)],
+                        3: context['title'],
                     })],
                 }, self.kw['filters'])
 
+    def page_name(self, i):
+        """Return the file name of the i-th page of a gallery.
+
+        The first page is INDEX_FILE, the others are like index-2.html.
+        """
+        if i == 0:
+            return self.kw['index_file']
+        root, ext = os.path.splitext(self.kw['index_file'])
+        return '{0}-{1}{2}'.format(root, i + 1, ext)
+
     def find_galleries(self):
         """Find all galleries to be processed according to conf.py"""
 
         self.gallery_list = []
+        # Subfolders and files of each gallery, so they are listed only once
+        self.gallery_dirs = {}
+        self.gallery_files = {}
+        self.index_posts = {}
         for root, dirs, files in os.walk(self.kw['gallery_path']):
             self.gallery_list.append(root)
+            self.gallery_dirs[root] = sorted(d for d in dirs if not d.startswith('.'))
+            self.gallery_files[root] = files
 
     def create_galleries(self):
         """Given a list of galleries, create the output folders."""
@@ -291,8 +399,17 @@ class Galleries(Task):
             }
 
     def parse_index(self, gallery):
-        """Returns a Post object if there is an index.txt."""
+        """Returns a Post object if there is an index.txt.
 
+        Posts are cached per folder, since each gallery's index is also
+        used for the folder list of its parent gallery.
+        """
+
+        if gallery not in self.index_posts:
+            self.index_posts[gallery] = self._parse_index(gallery)
+        return self.index_posts[gallery]
+
+    def _parse_index(self, gallery):
         index_path = os.path.join(gallery, "index.txt")
         destination = os.path.join(
             self.kw["output_folder"],
@@ -326,23 +443,25 @@ class Galleries(Task):
         except IOError:
             excluded_image_name_list = []
 
-        excluded_image_list = ["{0}/{1}".format(gallery_path, i) for i in excluded_image_name_list]
+        excluded_image_list = [os.path.join(gallery_path, i) for i in excluded_image_name_list]
         return excluded_image_list
 
     def get_image_list(self, gallery_path):
 
         # Gather image_list contains "gallery/name/image_name.jpg"
-        image_list = []
-
-        for ext in self.image_ext_list:
-            image_list += glob.glob(gallery_path + '/*' + ext.lower()) +\
-                glob.glob(gallery_path + '/*' + ext.upper())
+        if gallery_path in self.gallery_files:
+            files = self.gallery_files[gallery_path]
+        else:
+            files = os.listdir(gallery_path)
+        image_ext_set = set(ext.lower() for ext in self.image_ext_list)
+        image_list = [os.path.join(gallery_path, fname) for fname in files
+                      if not fname.startswith('.') and
+                      os.path.splitext(fname)[1].lower() in image_ext_set]
 
         # Filter ignored images
         excluded_image_list = self.get_excluded_images(gallery_path)
         image_set = set(image_list) - set(excluded_image_list)
-        image_list = list(image_set)
-        return image_list
+        return sorted(image_set)
 
     def create_target_images(self, img):
         gallery_name = os.path.relpath(os.path.dirname(img), self.kw['gallery_path'])
@@ -357,41 +476,147 @@ class Galleries(Task):
         # thumb_path is
         # "output/GALLERY_PATH/name/image_name.thumbnail.jpg"
         img_name = os.path.basename(img)
-        fname, ext = os.path.splitext(img_name)
-        thumb_path = os.path.join(
-            output_gallery,
-            ".thumbnail".join([fname, ext]))
-        # thumb_path is "output/GALLERY_PATH/name/image_name.jpg"
+        # orig_dest_path is "output/GALLERY_PATH/name/image_name.jpg"
         orig_dest_path = os.path.join(output_gallery, img_name)
-        yield utils.apply_filters({
-            'basename': self.name,
-            'name': thumb_path,
-            'file_dep': [img],
-            'targets': [thumb_path],
-            'actions': [
-                (self.resize_image,
-                    (img, thumb_path, self.kw['thumbnail_size']))
-            ],
-            'clean': True,
-            'uptodate': [utils.config_changed({
-                1: self.kw['thumbnail_size']
-            })],
-        }, self.kw['filters'])
-
-        yield utils.apply_filters({
+        variants = self.image_targets(orig_dest_path)
+        self.image_jobs.append((img, variants))
+        task = {
             'basename': self.name,
             'name': orig_dest_path,
             'file_dep': [img],
-            'targets': [orig_dest_path],
+            'targets': [dst for dst, max_size in variants],
             'actions': [
-                (self.resize_image,
-                    (img, orig_dest_path, self.kw['max_image_size']))
+                (self.resize_gallery_image, (img, variants))
             ],
             'clean': True,
             'uptodate': [utils.config_changed({
-                1: self.kw['max_image_size']
+                1: self.kw['thumbnail_size'],
+                2: self.kw['max_image_size'],
+                3: self.kw['srcset_sizes'],
+                4: self.kw['webp'],
+                5: self.kw['progressive_jpeg'],
+                6: self.copy_strategy(img),
             })],
-        }, self.kw['filters'])
+        }
+        if self.parallel:
+            task['task_dep'] = ['{0}:__batch__'.format(self.name)]
+        yield utils.apply_filters(task, self.kw['filters'])
+
+    def image_variants(self, orig_dest_path):
+        """Return the (path, max_size) pairs for the sizes of an output image.
+
+        These are the thumbnail, the image itself and the
+        GALLERY_SRCSET_SIZES variants, like image_name.640.jpg.
+        """
+        fname, ext = os.path.splitext(orig_dest_path)
+        variants = [(".thumbnail".join([fname, ext]), self.kw['thumbnail_size']),
+                    (orig_dest_path, self.kw['max_image_size'])]
+        for size in self.kw['srcset_sizes']:
+            variants.append(('{0}.{1}{2}'.format(fname, size, ext), size))
+        return variants
+
+    def image_targets(self, orig_dest_path):
+        """Return all (path, max_size) pairs to create for an output image.
+
+        With GALLERY_WEBP, every size also gets a WebP copy, named by
+        appending .webp (image_name.jpg.webp).
+        """
+        variants = self.image_variants(orig_dest_path)
+        if self.kw['webp']:
+            variants += [(dst + '.webp', max_size) for dst, max_size in variants]
+        return variants
+
+    def image_srcset(self, variants, url_from_path, image_cache=None):
+        """Return a srcset attribute listing the given sizes of an image."""
+        widths = {}
+        for dst, max_size in variants:
+            size = self.image_info(dst, image_cache)['size']
+            if size:
+                widths.setdefault(size[0], dst)
+        return ', '.join('{0} {1}w'.format(url_from_path(dst), width)
+                         for width, dst in sorted(widths.items()))
+
+    def resize_gallery_image(self, src, variants):
+        """Create the sizes of an image, unless resize_batch already did it."""
+        if src in self.resized:
+            for staged, dst in self.resized.pop(src):
+                utils.makedirs(os.path.dirname(dst))
+                shutil.move(staged, dst)
+        else:
+            self.resize_image_variants(src, variants, self.kw['progressive_jpeg'],
+                                       self.copy_strategy(src))
+
+    def copy_strategy(self, src):
+        """Return how to copy images that don't need resizing.
+
+        Filters modify images in place, so filtered images are always copied.
+        """
+        if utils.filters_for_extension(self.kw['filters'], os.path.splitext(src)[1].lower()):
+            return 'copy'
+        return self.kw['copy_strategy']
+
+    def resize_batch(self):
+        """Resize all outdated images using a pool of worker processes.
+
+        The results are staged in the cache folder and moved into place by
+        each image's own task, so doit still runs those tasks (and their
+        filters) as usual.
+        """
+        global _batch, _processor
+        staging = os.path.join(self.kw['cache_folder'], 'galleries_batch')
+        if os.path.isdir(staging):
+            shutil.rmtree(staging)
+        utils.makedirs(staging)
+
+        _batch = []
+        staged = {}
+        for src, variants in self.image_jobs:
+            src_mtime = os.stat(src).st_mtime
+            for dst, max_size in variants:
+                try:
+                    if os.stat(dst).st_mtime < src_mtime:
+                        break
+                except OSError:
+                    break
+            else:
+                continue
+            staged[src] = []
+            staged_variants = []
+            for j, (dst, max_size) in enumerate(variants):
+                tmp = os.path.join(staging, '{0}-{1}{2}'.format(
+                    len(_batch), j, os.path.splitext(dst)[1]))
+                staged[src].append((tmp, dst))
+                staged_variants.append((tmp, max_size))
+            _batch.append((src, staged_variants))
+        if len(_batch) < 2:
+            _batch = []
+            return
+
+        _processor = self
+        processes = min(self.site.config['GALLERY_WORKER_PROCESSES'] or
+                        utils.get_worker_count(self.site.config), len(_batch))
+        start = time.time()
+        slowest = (0, None)
+        try:
+            pool = multiprocessing.get_context('fork').Pool(processes)
+        except AttributeError:  # Python 2, where Pool always forks
+            pool = multiprocessing.Pool(processes)
+        try:
+            # chunksize=1: each worker holds a single decoded image at a time
+            for i, elapsed in pool.imap_unordered(_resize_batch_item, range(len(_batch)), 1):
+                src = _batch[i][0]
+                self.resized[src] = staged[src]
+                utils.LOGGER.debug('Resized {0} in {1:.2f}s'.format(src, elapsed))
+                slowest = max(slowest, (elapsed, src))
+        finally:
+            pool.close()
+            pool.join()
+        utils.LOGGER.info('Resized {0} images using {1} processes in {2:.1f}s '
+                          '(slowest: {3}, {4:.2f}s)'.format(
+                              len(_batch), processes, time.time() - start,
+                              slowest[1], slowest[0]))
+        _batch = []
+        _processor = None
 
     def remove_excluded_image(self, img):
         # Remove excluded images
@@ -404,28 +629,17 @@ class Galleries(Task):
                 self.kw["output_folder"],
                 self.site.path("gallery", os.path.dirname(img))))
         img_path = os.path.join(output_folder, os.path.basename(img))
-        fname, ext = os.path.splitext(img_path)
-        thumb_path = fname + '.thumbnail' + ext
-
-        yield utils.apply_filters({
-            'basename': '_render_galleries_clean',
-            'name': thumb_path,
-            'actions': [
-                (utils.remove_file, (thumb_path,))
-            ],
-            'clean': True,
-            'uptodate': [utils.config_changed(self.kw)],
-        }, self.kw['filters'])
 
-        yield utils.apply_filters({
-            'basename': '_render_galleries_clean',
-            'name': img_path,
-            'actions': [
-                (utils.remove_file, (img_path,))
-            ],
-            'clean': True,
-            'uptodate': [utils.config_changed(self.kw)],
-        }, self.kw['filters'])
+        for path, max_size in self.image_targets(img_path):
+            yield utils.apply_filters({
+                'basename': '_render_galleries_clean',
+                'name': path,
+                'actions': [
+                    (utils.remove_file, (path,))
+                ],
+                'clean': True,
+                'uptodate': [utils.config_changed(self.kw)],
+            }, self.kw['filters'])
 
     def render_gallery_index(
             self,
@@ -434,7 +648,8 @@ class Galleries(Task):
             context,
             img_list,
             thumbs,
-            file_dep):
+            file_dep,
+            image_cache=None):
         """Build the gallery index."""
 
         # The photo array needs to be created here, because
@@ -447,13 +662,12 @@ class Galleries(Task):
 
         photo_array = []
         for img, thumb in zip(img_list, thumbs):
-            im = Image.open(thumb)
-            w, h = im.size
+            w, h = self.image_info(thumb, image_cache)['size'] or (0, 0)
             title = ''
             if self.kw['use_filename_as_title']:
                 title = utils.unslugify(os.path.splitext(img)[0])
             # Thumbs are files in output, we need URLs
-            photo_array.append({
+            photo = {
                 'url': url_from_path(img),
                 'url_thumb': url_from_path(thumb),
                 'title': title,
@@ -461,15 +675,43 @@ class Galleries(Task):
                     'w': w,
                     'h': h
                 },
-            })
-        context['photo_array_json'] = json.dumps(photo_array)
+            }
+            variants = self.image_variants(img)
+            if self.kw['srcset_sizes']:
+                photo['srcset'] = self.image_srcset(variants, url_from_path, image_cache)
+            if self.kw['webp']:
+                photo['webp'] = {
+                    'url': url_from_path(img + '.webp'),
+                    'url_thumb': url_from_path(thumb + '.webp'),
+                    'srcset': self.image_srcset(
+                        [(dst + '.webp', max_size) for dst, max_size in variants],
+                        url_from_path, image_cache) if self.kw['srcset_sizes'] else '',
+                }
+            photo_array.append(photo)
+        if self.kw['lazy_photo_array']:
+            # Themes load the photo array from a separate file
+            json_path = os.path.splitext(output_name)[0] + '.json'
+            utils.makedirs(os.path.dirname(json_path))
+            with codecs.open(json_path, 'wb+', 'utf8') as outf:
+                outf.write(json.dumps(photo_array))
+            context['photo_array_json'] = None
+            context['photo_array_url'] = url_from_path(json_path)
+        else:
+            context['photo_array_json'] = json.dumps(photo_array)
+            context['photo_array_url'] = None
         context['photo_array'] = photo_array
 
         self.site.render_template(template_name, output_name, context)
 
-    def gallery_rss(self, img_list, img_titles, lang, permalink, output_path, title):
+    render_gallery_index.writes_page = True
+
+    def gallery_rss(self, img_list, img_titles, lang, permalink, output_path, title,
+                    img_dates=None):
         """Create a RSS showing the latest images in the gallery.
 
+        img_list holds the images to show, newest first, and img_dates
+        their dates, if already known.
+
         This doesn't use generic_rss_renderer because it
         doesn't involve Post objects.
         """
@@ -477,101 +719,28 @@ class Galleries(Task):
         def make_url(url):
             return urljoin(self.site.config['BASE_URL'], url)
 
+        if img_dates is None:
+            img_dates = [self.image_date(img) for img in img_list]
         items = []
-        for img, full_title in list(zip(img_list, img_titles))[:self.kw["feed_length"]]:
+        for img, full_title, date in list(zip(img_list, img_titles, img_dates))[:self.kw["feed_length"]]:
             img_size = os.stat(
                 os.path.join(
                     self.site.config['OUTPUT_FOLDER'], img)).st_size
-            args = {
+            items.append({
                 'title': full_title.split('"')[-2] if full_title else '',
                 'link': make_url(img),
-                'guid': rss.Guid(img, False),
-                'pubDate': self.image_date(img),
-                'enclosure': rss.Enclosure(
-                    make_url(img),
-                    img_size,
-                    mimetypes.guess_type(img)[0]
-                ),
-            }
-            items.append(rss.RSSItem(**args))
-        rss_obj = utils.ExtendedRSS2(
-            title=title,
-            link=make_url(permalink),
-            description='',
-            lastBuildDate=datetime.datetime.now(),
-            items=items,
-            generator='Nikola <http://getnikola.com/>',
-            language=lang
-        )
-        rss_obj.self_url = make_url(permalink)
-        rss_obj.rss_attrs["xmlns:atom"] = "http://www.w3.org/2005/Atom"
-        dst_dir = os.path.dirname(output_path)
-        utils.makedirs(dst_dir)
-        with codecs.open(output_path, "wb+", "utf-8") as rss_file:
-            data = rss_obj.to_xml(encoding='utf-8')
-            if isinstance(data, utils.bytes_str):
-                data = data.decode('utf-8')
-            rss_file.write(data)
-
-    def resize_image(self, src, dst, max_size):
-        """Make a copy of the image in the requested size."""
-        if not Image:
-            utils.copy_file(src, dst)
-            return
-        im = Image.open(src)
-        w, h = im.size
-        if w > max_size or h > max_size:
-            size = max_size, max_size
-
-            # Panoramas get larger thumbnails because they look *awful*
-            if w > 2 * h:
-                size = min(w, max_size * 4), min(w, max_size * 4)
-
-            try:
-                exif = im._getexif()
-            except Exception:
-                exif = None
-            if exif is not None:
-                for tag, value in list(exif.items()):
-                    decoded = ExifTags.TAGS.get(tag, tag)
-
-                    if decoded == 'Orientation':
-                        if value == 3:
-                            im = im.rotate(180)
-                        elif value == 6:
-                            im = im.rotate(270)
-                        elif value == 8:
-                            im = im.rotate(90)
-                        break
-            try:
-                im.thumbnail(size, Image.ANTIALIAS)
-                im.save(dst)
-            except Exception as e:
-                self.logger.warn("Can't thumbnail {0}, using original "
-                                 "image as thumbnail ({1})".format(src, e))
-                utils.copy_file(src, dst)
-        else:  # Image is small
-            utils.copy_file(src, dst)
-
-    def image_date(self, src):
-        """Try to figure out the date of the image."""
-        if src not in self.dates:
-            try:
-                im = Image.open(src)
-                exif = im._getexif()
-            except Exception:
-                exif = None
-            if exif is not None:
-                for tag, value in list(exif.items()):
-                    decoded = ExifTags.TAGS.get(tag, tag)
-                    if decoded == 'DateTimeOriginal':
-                        try:
-                            self.dates[src] = datetime.datetime.strptime(
-                                value, r'%Y:%m:%d %H:%M:%S')
-                            break
-                        except ValueError:  # Invalid EXIF date.
-                            pass
-        if src not in self.dates:
-            self.dates[src] = datetime.datetime.fromtimestamp(
-                os.stat(src).st_mtime)
-        return self.dates[src]
+                'description': None,
+                'guid': img,
+                'guid_is_permalink': False,
+                'date': date,
+                'enclosure': (make_url(img), img_size, mimetypes.guess_type(img)[0]),
+            })
+        feeds.write_feeds(self.site.feed_paths(output_path), {
+            'title': title,
+            'link': make_url(permalink),
+            'description': '',
+            'feed_url': make_url(permalink),
+            'language': lang,
+        }, items)
+
+    gallery_rss.writes_feed = True
@@ -24,55 +24,174 @@
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-"""Create gzipped copies of files."""
+"""Create precompressed (gzip and Brotli) copies of files."""
 
 import gzip
 import os
 import shlex
+import shutil
 import subprocess
+from multiprocessing.pool import ThreadPool
 
-from nikola.plugin_categories import TaskMultiplier
+try:
+    import brotli
+except ImportError:
+    brotli = None  # NOQA
 
+from nikola.plugin_categories import LateTask
+from nikola import utils
 
-class GzipFiles(TaskMultiplier):
-    """If appropiate, create tasks to create gzipped versions of files."""
+CHUNK_SIZE = 64 * 1024
+
+
+class GzipFiles(LateTask):
+    """Create compressed copies of output files, for servers that can use them."""
 
     name = "gzip"
-    is_default = True
-
-    def process(self, task, prefix):
-        if not self.site.config['GZIP_FILES']:
-            return []
-        if task.get('name') is None:
-            return []
-        gzip_task = {
-            'file_dep': [],
-            'targets': [],
-            'actions': [],
-            'basename': '{0}_gzip'.format(prefix),
-            'name': task.get('name').split(":", 1)[-1] + '.gz',
-            'clean': True,
+
+    def set_site(self, site):
+        super(GzipFiles, self).set_site(site)
+        if brotli is None and self.site.config['BROTLI_FILES']:
+            utils.req_missing(['brotli'], 'use BROTLI_FILES', optional=True)
+            utils.LOGGER.warn('Setting BROTLI_FILES to False.')
+            self.site.config['BROTLI_FILES'] = False
+
+    def gen_tasks(self):
+        """Compress output files after everything else is built."""
+        kw = {
+            'output_folder': self.site.config['OUTPUT_FOLDER'],
+            'cache_folder': self.site.config['CACHE_FOLDER'],
+            'gzip_files': self.site.config['GZIP_FILES'],
+            'gzip_extensions': tuple(ext.lower() for ext in self.site.config['GZIP_EXTENSIONS']),
+            'gzip_command': self.site.config['GZIP_COMMAND'],
+            'brotli_files': self.site.config['BROTLI_FILES'],
+        }
+        yield self.group_task()
+        if not (kw['gzip_files'] or kw['brotli_files']):
+            return
+
+        # Run after the rest of the site, including the other late tasks
+        task_dep = ['render_site']
+        for plugin_info in self.site.plugin_manager.getPluginsOfCategory("LateTask"):
+            plugin = plugin_info.plugin_object
+            if plugin is not self and plugin.is_default:
+                task_dep.append(plugin.name)
+
+        yield {
+            'basename': self.name,
+            'name': 'all',
+            'actions': [(self.compress_output, (kw,))],
+            'task_dep': task_dep,
+            'clean': [(self.remove_compressed_copies, (kw,))],
         }
-        targets = task.get('targets', [])
-        flag = False
-        for target in targets:
-            ext = os.path.splitext(target)[1]
-            if (ext.lower() in self.site.config['GZIP_EXTENSIONS'] and
-                    target.startswith(self.site.config['OUTPUT_FOLDER'])):
-                flag = True
-                gzipped = target + '.gz'
-                gzip_task['file_dep'].append(target)
-                gzip_task['targets'].append(gzipped)
-                gzip_task['actions'].append((create_gzipped_copy, (target, gzipped, self.site.config['GZIP_COMMAND'])))
-        if not flag:
-            return []
-        return [gzip_task]
+
+    def compressed_paths(self, kw, path):
+        """Return the (kind, compressed path) pairs to create for path."""
+        paths = []
+        if kw['gzip_files']:
+            paths.append(('gzip', path + '.gz'))
+        if kw['brotli_files']:
+            paths.append(('brotli', path + '.br'))
+        return paths
+
+    def find_candidates(self, kw):
+        """Return the output files that should have compressed copies."""
+        candidates = []
+        for root, dirs, files in os.walk(kw['output_folder']):
+            for fname in files:
+                if os.path.splitext(fname)[1].lower() in kw['gzip_extensions']:
+                    candidates.append(os.path.join(root, fname))
+        return candidates
+
+    def compress_output(self, kw):
+        """Compress every new or changed candidate using a pool of threads.
+
+        Results are kept in a cache, keyed by the signature of each file,
+        so unchanged files are not compressed again, not even the ones
+        that compression did not make smaller.
+        """
+        cache = utils.PersistentCache(
+            os.path.join(kw['cache_folder'], 'precompressed.json'),
+            repr((kw['gzip_files'], kw['brotli_files'], kw['gzip_command'])))
+        pending = []
+        for path in self.find_candidates(kw):
+            signature = utils.file_signature(path)
+            kept = cache.get(path, signature)
+            if kept is not None and all(os.path.exists(out) for out in kept):
+                continue
+            pending.append((path, signature))
+
+        def compress(job):
+            path, signature = job
+            return path, signature, compress_file(
+                path, self.compressed_paths(kw, path), kw['gzip_command'])
+
+        if pending:
+            pool = ThreadPool(min(utils.get_worker_count(self.site.config), len(pending)))
+            try:
+                for path, signature, kept in pool.imap_unordered(compress, pending):
+                    cache.set(path, signature, kept)
+            finally:
+                pool.close()
+                pool.join()
+            utils.LOGGER.info('Compressed {0} files'.format(len(pending)))
+        cache.save(prune=True)
+
+    def remove_compressed_copies(self, kw):
+        """Remove the compressed copies of all candidates."""
+        for path in self.find_candidates(kw):
+            for kind, out_path in self.compressed_paths(kw, path):
+                utils.remove_file(out_path)
+
+
+def compress_file(in_path, outputs, command=None):
+    """Create the compressed copies of in_path.
+
+    outputs is a list of (kind, path) pairs, where kind is 'gzip' or
+    'brotli'. Copies that are not smaller than the file are removed.
+    Returns the paths of the copies that were kept.
+    """
+    size = os.path.getsize(in_path)
+    kept = []
+    for kind, out_path in outputs:
+        if kind == 'gzip':
+            create_gzipped_copy(in_path, out_path, command)
+        else:
+            create_brotli_copy(in_path, out_path)
+        if os.path.getsize(out_path) < size:
+            kept.append(out_path)
+            # Same mtime as the original, so unchanged copies look unchanged
+            st = os.stat(in_path)
+            os.utime(out_path, (st.st_atime, st.st_mtime))
+        else:
+            os.remove(out_path)
+    return kept
 
 
 def create_gzipped_copy(in_path, out_path, command=None):
+    """Create a gzipped copy of in_path, reading it in chunks.
+
+    The copy has no file name or timestamp in its header, so compressing
+    the same data always gives the same bytes.
+    """
+    if os.path.lexists(out_path):
+        os.unlink(out_path)  # It may be a hard link to a source file
     if command:
         subprocess.check_call(shlex.split(command.format(filename=in_path)))
     else:
-        with gzip.GzipFile(out_path, 'wb+') as outf:
-            with open(in_path, 'rb') as inf:
-                outf.write(inf.read())
+        with open(out_path, 'wb') as raw:
+            with gzip.GzipFile('', 'wb', 9, raw, 0) as outf:
+                with open(in_path, 'rb') as inf:
+                    shutil.copyfileobj(inf, outf, CHUNK_SIZE)
+
+
+def create_brotli_copy(in_path, out_path):
+    """Create a Brotli-compressed copy of in_path, reading it in chunks."""
+    compressor = brotli.Compressor()
+    if os.path.lexists(out_path):
+        os.unlink(out_path)  # It may be a hard link to a source file
+    with open(out_path, 'wb') as outf:
+        with open(in_path, 'rb') as inf:
+            for chunk in iter(lambda: inf.read(CHUNK_SIZE), b''):
+                outf.write(compressor.process(chunk))
+        outf.write(compressor.finish())
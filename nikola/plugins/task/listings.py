@@ -87,6 +87,7 @@ class Listings(Task):
             }
             self.site.render_template('listing.tmpl', out_name,
                                       context)
+        render_listing.writes_page = True
 
         yield self.group_task()
 
@@ -29,8 +29,6 @@ import codecs
 import json
 import os
 
-from doit.tools import result_dep
-
 from nikola.plugin_categories import LateTask
 from nikola.utils import config_changed, copy_tree, makedirs
 
@@ -61,43 +59,55 @@ class Tipue(LateTask):
         kw = {
             "translations": self.site.config['TRANSLATIONS'],
             "output_folder": self.site.config['OUTPUT_FOLDER'],
+            "hide_untranslated_posts": self.site.config['HIDE_UNTRANSLATED_POSTS'],
         }
 
         posts = self.site.timeline[:]
+        indexed = []
+        for lang in kw["translations"]:
+            for post in posts:
+                # Don't index drafts (Issue #387)
+                if post.is_draft or post.is_retired or post.publish_later:
+                    continue
+                # Hidden untranslated posts have no page in lang
+                if kw["hide_untranslated_posts"] and not post.is_translation_available(lang):
+                    continue
+                indexed.append((post, lang))
         dst_path = os.path.join(kw["output_folder"], "assets", "js",
                                 "tipuesearch_content.json")
 
         def save_data():
             pages = []
-            for lang in kw["translations"]:
-                for post in posts:
-                    # Don't index drafts (Issue #387)
-                    if post.is_draft or post.is_retired or post.publish_later:
-                        continue
-                    text = post.text(lang, strip_html=True)
-                    text = text.replace('^', '')
-
-                    data = {}
-                    data["title"] = post.title(lang)
-                    data["text"] = text
-                    data["tags"] = ",".join(post.tags)
-                    data["loc"] = post.permalink(lang)
-                    pages.append(data)
+            for post, lang in indexed:
+                text = post.text(lang, strip_html=True)
+                text = text.replace('^', '')
+
+                data = {}
+                data["title"] = post.title(lang)
+                data["text"] = text
+                data["tags"] = ",".join(post.tags)
+                data["loc"] = post.permalink(lang)
+                pages.append(data)
             output = json.dumps({"pages": pages}, indent=2)
             makedirs(os.path.dirname(dst_path))
             with codecs.open(dst_path, "wb+", "utf8") as fd:
                 fd.write(output)
 
+        # The data changes when posts are added or removed, or when their
+        # sources change.
+        deps = []
+        for post, lang in indexed:
+            deps += post.deps(lang)
         yield {
             "basename": str(self.name),
             "name": dst_path,
             "targets": [dst_path],
             "actions": [(save_data, [])],
-            'uptodate': [config_changed(kw), result_dep('sitemap')]
+            "file_dep": deps,
+            # A single config_changed: doit keeps one digest per task
+            'uptodate': [config_changed(dict(
+                kw, posts=[post.source_path for post in posts]))]
         }
-        # Note: The task should run everytime a new file is added or a
-        # file is changed.  We cheat, and depend on the sitemap task,
-        # to run everytime a new file is added.
 
         # Copy all the assets to the right places
         asset_folder = os.path.join(os.path.dirname(__file__), "files")
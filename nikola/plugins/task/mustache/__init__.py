@@ -133,17 +133,18 @@ class Mustache(Task):
             for i, post in enumerate(posts):
                 out_path = post.destination_path(lang, ".json")
                 out_file = os.path.join(kw['output_folder'], out_path)
+                # The compiled fragment is a dependency, instead of its
+                # text, so that checking the task doesn't read every post.
                 task = {
                     'basename': 'render_mustache',
                     'name': out_file,
-                    'file_dep': post.fragment_deps(lang),
+                    'file_dep': post.fragment_deps(lang) + [post._translated_file_path(lang)],
                     'targets': [out_file],
                     'actions': [(write_file, (out_file, post, lang))],
                     'task_dep': ['render_posts'],
                     'uptodate': [config_changed({
-                        1: post.text(lang),
-                        2: post.prev_post,
-                        3: post.next_post,
+                        2: post.prev_post.permalink(lang) if post.prev_post else None,
+                        3: post.next_post.permalink(lang) if post.next_post else None,
                         4: post.title(lang),
                     })]
                 }
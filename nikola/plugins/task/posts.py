@@ -25,11 +25,27 @@
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 from copy import copy
+import multiprocessing
+import os
+import time
+
 import nikola.post
 
 from nikola.plugin_categories import Task
 from nikola import utils
 
+# The (post, lang) pairs compiled by the worker processes. Workers are
+# forked, so they inherit this list (and the fully configured compilers
+# and reST extensions) instead of receiving pickled posts.
+_batch = []
+
+
+def _compile_batch_item(i):
+    """Compile the i-th fragment of the current batch, in a worker process."""
+    post, lang = _batch[i]
+    post.compile(lang)
+    return i
+
 
 class RenderPosts(Task):
     """Build HTML fragments from metadata and text."""
@@ -49,6 +65,15 @@ class RenderPosts(Task):
         nikola.post.READ_MORE_LINK = self.site.config['READ_MORE_LINK']
         yield self.group_task()
 
+        self.compiled = set([])
+        parallel = self.site.config['PARALLEL_COMPILE'] and hasattr(os, 'fork')
+        if parallel:
+            yield {
+                'basename': self.name,
+                'name': '__batch__',
+                'actions': [(self.compile_batch, (kw, ))],
+            }
+
         for lang in kw["translations"]:
             deps_dict = copy(kw)
             deps_dict.pop('timeline')
@@ -59,8 +84,51 @@ class RenderPosts(Task):
                     'name': dest,
                     'file_dep': post.fragment_deps(lang),
                     'targets': [dest],
-                    'actions': [(post.compile, (lang, ))],
+                    'actions': [(self.compile_post, (post, lang))],
                     'clean': True,
                     'uptodate': [utils.config_changed(deps_dict)],
                 }
+                if parallel:
+                    task['task_dep'] = ['{0}:__batch__'.format(self.name)]
                 yield task
+
+    def compile_post(self, post, lang):
+        """Compile a post, unless compile_batch already did it."""
+        if (post.source_path, lang) not in self.compiled:
+            post.compile(lang)
+
+    def compile_batch(self, kw):
+        """Compile all outdated fragments using a pool of worker processes."""
+        global _batch
+        _batch = []
+        for lang in kw["translations"]:
+            for post in kw['timeline']:
+                if kw['hide_untranslated_posts'] and not post.is_translation_available(lang):
+                    continue  # Post.compile does nothing, and writes no fragment
+                dest = post.translated_base_path(lang)
+                try:
+                    dest_mtime = os.stat(dest).st_mtime
+                except OSError:
+                    dest_mtime = None
+                if dest_mtime is None or any(os.stat(d).st_mtime > dest_mtime
+                                             for d in post.fragment_deps(lang)):
+                    _batch.append((post, lang))
+        if len(_batch) < 2:
+            return
+
+        processes = min(utils.get_worker_count(self.site.config), len(_batch))
+        start = time.time()
+        try:
+            pool = multiprocessing.get_context('fork').Pool(processes)
+        except AttributeError:  # Python 2, where Pool always forks
+            pool = multiprocessing.Pool(processes)
+        try:
+            for i in pool.imap_unordered(_compile_batch_item, range(len(_batch))):
+                post, lang = _batch[i]
+                self.compiled.add((post.source_path, lang))
+        finally:
+            pool.close()
+            pool.join()
+        utils.LOGGER.info('Compiled {0} posts using {1} processes in {2:.1f}s'.format(
+            len(_batch), processes, time.time() - start))
+        _batch = []
@@ -56,6 +56,7 @@ class GenerateRSS(Task):
             "rss_teasers": self.site.config["RSS_TEASERS"],
             "hide_untranslated_posts": self.site.config['HIDE_UNTRANSLATED_POSTS'],
             "feed_length": self.site.config['FEED_LENGTH'],
+            "feed_formats": self.site.config['FEED_FORMATS'],
         }
         self.site.scan_posts()
         # Check for any changes in the state of use_in_feeds for any post.
@@ -68,11 +69,7 @@ class GenerateRSS(Task):
             output_name = os.path.join(kw['output_folder'],
                                        self.site.path("rss", None, lang))
             deps = []
-            if kw["hide_untranslated_posts"]:
-                posts = [x for x in self.site.timeline if x.use_in_feeds
-                         and x.is_translation_available(lang)][:10]
-            else:
-                posts = [x for x in self.site.timeline if x.use_in_feeds][:10]
+            posts = self.site.feed_window(lang)
             for post in posts:
                 deps += post.deps(lang)
 
@@ -81,7 +78,7 @@ class GenerateRSS(Task):
                 'basename': 'generate_rss',
                 'name': os.path.normpath(output_name),
                 'file_dep': deps,
-                'targets': [output_name],
+                'targets': sorted(self.site.feed_paths(output_name).values()),
                 'actions': [(utils.generic_rss_renderer,
                             (lang, kw["blog_title"](lang), kw["site_url"],
                              kw["blog_description"](lang), posts, output_name,
@@ -27,6 +27,7 @@
 from __future__ import print_function, absolute_import, unicode_literals
 import codecs
 import datetime
+import hashlib
 import os
 try:
     from urlparse import urljoin, urlparse
@@ -34,7 +35,7 @@ except ImportError:
     from urllib.parse import urljoin, urlparse  # NOQA
 
 from nikola.plugin_categories import LateTask
-from nikola.utils import config_changed
+from nikola.utils import config_changed, file_signature, PersistentCache
 
 
 header = """<?xml version="1.0" encoding="UTF-8"?>
@@ -51,6 +52,16 @@ url_format = """ <url>
  </url>
 """
 
+index_header = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+"""
+
+sitemap_format = """ <sitemap>
+  <loc>{0}</loc>
+  <lastmod>{1}</lastmod>
+ </sitemap>
+"""
+
 get_lastmod = lambda p: datetime.datetime.fromtimestamp(os.stat(p).st_mtime).isoformat().split('T')[0]
 
 
@@ -79,6 +90,90 @@ def get_base_path(base):
         return sub_path + '/'
 
 
+def written_by(task, marker):
+    """Tell if one of the task's actions is a function marked with marker."""
+    for action in task.get('actions') or []:
+        if isinstance(action, (tuple, list)) and getattr(action[0], marker, False):
+            return True
+    return False
+
+
+def is_listable(path):
+    """Tell if a file that was not rendered by Nikola belongs in the sitemap.
+
+    This reads the start of the file: HTML files without a doctype
+    (alexa-verify, google-site-verification, etc.) and XML files that
+    are not RSS feeds are left out.
+    """
+    if not os.path.isfile(path):
+        return False
+    if path.endswith('.html') or path.endswith('.htm'):
+        with codecs.open(path, 'r', 'utf8') as inf:
+            return '<!doctype html' in inf.read(1024).lower()
+    if path.endswith('.xml'):
+        with codecs.open(path, 'r', 'utf8') as inf:
+            return '<rss' in inf.read(512)
+    return True
+
+
+def get_lastmods(entries, cache):
+    """Yield (loc, lastmod) for the entries that belong in the sitemap.
+
+    Files are only stat()ed.  Whether a file that was not rendered by
+    Nikola belongs in the sitemap is kept in cache, so it is only read
+    again if it changed.
+    """
+    for loc, path, known in entries:
+        signature = file_signature(path)
+        if signature is None:
+            continue
+        if not known:
+            listable = cache.get(path, signature)
+            if listable is None:
+                listable = is_listable(path)
+                cache.set(path, signature, listable)
+            if not listable:
+                continue
+        yield loc, datetime.datetime.fromtimestamp(signature[0]).isoformat().split('T')[0]
+
+
+def lastmods_digest(entries, cache):
+    """Return a digest of the locations and modification dates of entries."""
+    digest = hashlib.md5()
+    for loc, lastmod in get_lastmods(entries, cache):
+        digest.update((loc + ' ' + lastmod + '\n').encode('utf8'))
+    return digest.hexdigest()
+
+
+def lastmods_unchanged(task, values, entries, cache):
+    """doit uptodate check: the sitemap is current if no lastmod changed."""
+    digest = lastmods_digest(entries, cache)
+    cache.save()
+    return values.get('lastmods') == digest
+
+
+def write_sitemap(path, entries, cache):
+    """Write a sitemap of entries to path, one <url> at a time."""
+    digest = hashlib.md5()
+    with codecs.open(path, 'wb+', 'utf8') as outf:
+        outf.write(header)
+        for loc, lastmod in get_lastmods(entries, cache):
+            outf.write(url_format.format(loc, lastmod))
+            digest.update((loc + ' ' + lastmod + '\n').encode('utf8'))
+        outf.write("</urlset>")
+    cache.save(prune=True)
+    return {'lastmods': digest.hexdigest()}
+
+
+def write_sitemap_index(path, sitemaps):
+    """Write a sitemap index listing sitemaps, a list of (loc, path)."""
+    with codecs.open(path, 'wb+', 'utf8') as outf:
+        outf.write(index_header)
+        for loc, sitemap_path in sitemaps:
+            outf.write(sitemap_format.format(loc, get_lastmod(sitemap_path)))
+        outf.write("</sitemapindex>")
+
+
 class Sitemap(LateTask):
     """Generate google sitemap."""
 
@@ -92,89 +187,78 @@ class Sitemap(LateTask):
             "output_folder": self.site.config["OUTPUT_FOLDER"],
             "strip_indexes": self.site.config["STRIP_INDEXES"],
             "index_file": self.site.config["INDEX_FILE"],
-            "sitemap_include_fileless_dirs": self.site.config["SITEMAP_INCLUDE_FILELESS_DIRS"],
-            "mapped_extensions": self.site.config.get('MAPPED_EXTENSIONS', ['.html', '.htm', '.xml'])
+            "sitemap_urls_per_file": self.site.config["SITEMAP_URLS_PER_FILE"],
+            "mapped_extensions": self.site.config.get('MAPPED_EXTENSIONS', ['.html', '.htm', '.xml']),
+            "cache_folder": self.site.config['CACHE_FOLDER'],
         }
-        output_path = kw['output_folder']
-        sitemap_path = os.path.join(output_path, "sitemap.xml")
-        base_path = get_base_path(kw['base_url'])
-        locs = {}
-
         output = kw['output_folder']
+        sitemap_path = os.path.join(output, "sitemap.xml")
+        base_path = get_base_path(kw['base_url'])
         base_url = kw['base_url']
-        mapped_exts = kw['mapped_extensions']
-
-        def scan_locs():
-            for root, dirs, files in os.walk(output):
-                if not dirs and not files and not kw['sitemap_include_fileless_dirs']:
-                    continue  # Totally empty, not on sitemap
-                path = os.path.relpath(root, output)
-                # ignore the current directory.
-                path = (path.replace(os.sep, '/') + '/').replace('./', '')
-                lastmod = get_lastmod(root)
-                loc = urljoin(base_url, base_path + path)
-                if kw['index_file'] in files and kw['strip_indexes']:  # ignore folders when not stripping urls
-                    locs[loc] = url_format.format(loc, lastmod)
-                for fname in files:
-                    if kw['strip_indexes'] and fname == kw['index_file']:
-                        continue  # We already mapped the folder
-                    if os.path.splitext(fname)[-1] in mapped_exts:
-                        real_path = os.path.join(root, fname)
-                        path = os.path.relpath(real_path, output)
-                        if path.endswith(kw['index_file']) and kw['strip_indexes']:
-                            # ignore index files when stripping urls
-                            continue
-                        if path.endswith('.html') or path.endswith('.htm'):
-                            if not u'<!doctype html' in codecs.open(real_path, 'r', 'utf8').read(1024).lower():
-                                # ignores "html" files without doctype
-                                # alexa-verify, google-site-verification, etc.
-                                continue
-                        if path.endswith('.xml'):
-                            if not u'<rss' in codecs.open(real_path, 'r', 'utf8').read(512):
-                                # ignores all XML files except those presumed to be RSS
-                                continue
-                        post = self.site.post_per_file.get(path)
-                        if post and (post.is_draft or post.is_retired or post.publish_later):
-                            continue
-                        path = path.replace(os.sep, '/')
-                        lastmod = get_lastmod(real_path)
-                        loc = urljoin(base_url, base_path + path)
-                        locs[loc] = url_format.format(loc, lastmod)
-
-        def write_sitemap():
-            # Have to rescan, because files may have been added between
-            # task dep scanning and task execution
-            with codecs.open(sitemap_path, 'wb+', 'utf8') as outf:
-                outf.write(header)
-                for k in sorted(locs.keys()):
-                    outf.write(locs[k])
-                outf.write("</urlset>")
-
-        # Yield a task to calculate the dependencies of the sitemap
-        # Other tasks can depend on this output, instead of having
-        # to scan locations.
-        def scan_locs_task():
-            scan_locs()
-            return {'locations': list(locs.keys())}
-
-        yield {
-            "basename": "_scan_locs",
-            "name": "sitemap",
-            "actions": [(scan_locs_task)]
-        }
+        entries = []
+        for target, task in self.site.task_targets.items():
+            path = os.path.relpath(target, output)
+            if path.startswith(os.pardir):
+                continue
+            ext = os.path.splitext(path)[-1]
+            if ext not in kw['mapped_extensions']:
+                continue
+            post = self.site.post_per_file.get(path)
+            if post and (post.is_draft or post.is_retired or post.publish_later):
+                continue
+            path = path.replace(os.sep, '/')
+            if kw['strip_indexes'] and os.path.basename(target) == kw['index_file']:
+                # List the folder instead of its index file
+                path = path[:-len(kw['index_file'])]
+            if ext in ('.html', '.htm'):
+                known = written_by(task, 'writes_page')
+            elif ext == '.xml':
+                known = written_by(task, 'writes_feed')
+            else:
+                known = True
+            entries.append((urljoin(base_url, base_path + path), target, known))
+        entries.sort()
 
         yield self.group_task()
-        task = {
-            "basename": "sitemap",
-            "name": sitemap_path,
-            "targets": [sitemap_path],
-            "actions": [(write_sitemap,)],
-            "uptodate": [config_changed(kw)],
-            "clean": True,
-            "task_dep": ["render_site"],
-            "calc_dep": ["_scan_locs:sitemap"],
-        }
-        yield task
+
+        # Big sites get several sitemaps, listed in sitemap.xml
+        size = kw['sitemap_urls_per_file']
+        if len(entries) <= size:
+            chunks = [(sitemap_path, entries)]
+        else:
+            chunks = []
+            for i in range(0, len(entries), size):
+                chunks.append((os.path.join(output, "sitemap-{0}.xml".format(i // size + 1)),
+                               entries[i:i + size]))
+
+        for path, chunk in chunks:
+            # One cache per sitemap file, so each can be pruned on its own
+            cache = PersistentCache(os.path.join(
+                kw['cache_folder'], 'sitemap', os.path.splitext(os.path.basename(path))[0] + '.json'))
+            yield {
+                "basename": "sitemap",
+                "name": path,
+                "targets": [path],
+                "actions": [(write_sitemap, (path, chunk, cache))],
+                "uptodate": [config_changed({
+                    'kw': kw, 'locations': [loc for loc, _, _ in chunk]}),
+                    (lastmods_unchanged, (chunk, cache))],
+                "clean": True,
+                "task_dep": ["render_site"],
+            }
+
+        if len(chunks) > 1:
+            sitemaps = [(urljoin(base_url, base_path + os.path.basename(path)), path)
+                        for path, _ in chunks]
+            yield {
+                "basename": "sitemap",
+                "name": sitemap_path,
+                "targets": [sitemap_path],
+                "actions": [(write_sitemap_index, (sitemap_path, sitemaps))],
+                "file_dep": [path for path, _ in chunks],
+                "uptodate": [config_changed(kw)],
+                "clean": True,
+            }
 
 if __name__ == '__main__':
     import doctest
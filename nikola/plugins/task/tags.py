@@ -25,7 +25,9 @@
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 from __future__ import unicode_literals
+from collections import defaultdict
 import codecs
+import hashlib
 import json
 import os
 try:
@@ -67,6 +69,7 @@ class RenderTags(Task):
             "rss_teasers": self.site.config["RSS_TEASERS"],
             "hide_untranslated_posts": self.site.config['HIDE_UNTRANSLATED_POSTS'],
             "feed_length": self.site.config['FEED_LENGTH'],
+            "feed_formats": self.site.config['FEED_FORMATS'],
         }
 
         self.site.scan_posts()
@@ -77,20 +80,28 @@ class RenderTags(Task):
         if not self.site.posts_per_tag and not self.site.posts_per_category:
             return
 
-        tag_list = list(self.site.posts_per_tag.items())
-        cat_list = list(self.site.posts_per_category.items())
-
-        def render_lists(tag, posts, is_category=True):
-            post_list = [self.site.global_data[post] for post in posts]
-            post_list.sort(key=lambda a: a.date)
-            post_list.reverse()
+        def sorted_post_lists(groups):
+            """Get the posts of every group, newest first, in one pass over the timeline."""
+            groups_per_post = defaultdict(list)
+            for name, posts in groups.items():
+                for post in posts:
+                    groups_per_post[post].append(name)
+            post_lists = dict((name, []) for name in groups)
+            for post in self.site.timeline:
+                for name in groups_per_post.get(post.source_path, ()):
+                    post_lists[name].append(post)
+            return post_lists
+
+        tag_list = list(sorted_post_lists(self.site.posts_per_tag).items())
+        cat_list = list(sorted_post_lists(self.site.posts_per_category).items())
+
+        def render_lists(tag, post_list, is_category=True):
             for lang in kw["translations"]:
                 if kw["hide_untranslated_posts"]:
                     filtered_posts = [x for x in post_list if x.is_translation_available(lang)]
                 else:
                     filtered_posts = post_list
-                rss_post_list = [p.source_path for p in filtered_posts]
-                yield self.tag_rss(tag, lang, rss_post_list, kw, is_category)
+                yield self.tag_rss(tag, lang, kw, is_category)
                 # Render HTML
                 if kw['tag_pages_are_indexes']:
                     yield self.tag_page_as_index(tag, lang, filtered_posts, kw, is_category)
@@ -108,32 +119,39 @@ class RenderTags(Task):
                 yield task
 
         # Tag cloud json file
-        tag_cloud_data = {}
-        for tag, posts in self.site.posts_per_tag.items():
-            tag_posts = dict(posts=[{'title': post.meta[post.default_lang]['title'],
+        # Build the post lists of all tags in a single pass over the posts
+        tag_posts = dict((tag, []) for tag in self.site.posts_per_tag)
+        for post in reversed(sorted(self.site.timeline, key=lambda post: post.date)):
+            post_data = None
+            for tag in post.alltags:
+                if tag in tag_posts:
+                    if post_data is None:
+                        post_data = {'title': post.meta[post.default_lang]['title'],
                                      'date': post.date.strftime('%m/%d/%Y'),
                                      'isodate': post.date.isoformat(),
                                      'url': post.base_path.replace('cache', '')}
-                                    for post in reversed(sorted(self.site.timeline, key=lambda post: post.date))
-                                    if tag in post.alltags])
+                    tag_posts[tag].append(post_data)
+        tag_cloud_data = {}
+        for tag, posts in self.site.posts_per_tag.items():
             tag_cloud_data[tag] = [len(posts), self.site.link(
-                'tag', tag, self.site.config['DEFAULT_LANG']), tag_posts]
+                'tag', tag, self.site.config['DEFAULT_LANG']), dict(posts=tag_posts[tag])]
+        data = json.dumps(tag_cloud_data, sort_keys=True)
         output_name = os.path.join(kw['output_folder'],
                                    'assets', 'js', 'tag_cloud_data.json')
 
         def write_tag_data(data):
             utils.makedirs(os.path.dirname(output_name))
             with codecs.open(output_name, 'wb+', 'utf8') as fd:
-                fd.write(json.dumps(data))
+                fd.write(data)
 
         task = {
             'basename': str(self.name),
             'name': str(output_name)
         }
 
-        task['uptodate'] = [utils.config_changed(tag_cloud_data)]
+        task['uptodate'] = [utils.config_changed(hashlib.md5(data.encode('utf-8')).hexdigest())]
         task['targets'] = [output_name]
-        task['actions'] = [(write_tag_data, [tag_cloud_data])]
+        task['actions'] = [(write_tag_data, [data])]
         task['clean'] = True
         yield task
 
@@ -271,7 +289,7 @@ class RenderTags(Task):
         task['basename'] = str(self.name)
         yield task
 
-    def tag_rss(self, tag, lang, posts, kw, is_category):
+    def tag_rss(self, tag, lang, kw, is_category):
         """RSS for a single tag / language"""
         kind = "category" if is_category else "tag"
         #Render RSS
@@ -280,17 +298,14 @@ class RenderTags(Task):
                          self.site.path(kind + "_rss", tag, lang)))
         feed_url = urljoin(self.site.config['BASE_URL'], self.site.link(kind + "_rss", tag, lang).lstrip('/'))
         deps = []
-        post_list = [self.site.global_data[post] for post in posts if
-                     self.site.global_data[post].use_in_feeds]
-        post_list.sort(key=lambda a: a.date)
-        post_list.reverse()
+        post_list = self.site.feed_window(lang, kind, tag)
         for post in post_list:
             deps += post.deps(lang)
         return {
             'basename': str(self.name),
             'name': output_name,
             'file_dep': deps,
-            'targets': [output_name],
+            'targets': sorted(self.site.feed_paths(output_name).values()),
             'actions': [(utils.generic_rss_renderer,
                         (lang, "{0} ({1})".format(kw["blog_title"], tag),
                          kw["site_url"], None, post_list,
@@ -55,11 +55,12 @@ from .utils import (
     to_datetime,
     unicode_str,
     demote_headers,
+    file_signature,
     get_translation_candidate,
 )
 from .rc4 import rc4
 
-__all__ = ['Post']
+__all__ = ['Post', 'get_post_metadata']
 
 TEASER_REGEXP = re.compile('<!--\s*TEASER_END(:(.+))?\s*-->', re.IGNORECASE)
 READ_MORE_LINK = '<p class="more"><a href="{link}">{read_more}…</a></p>'
@@ -77,13 +78,18 @@ class Post(object):
         use_in_feeds,
         messages,
         template_name,
-        compiler
+        compiler,
+        metadata=None
     ):
         """Initialize post.
 
         The source path is the user created post file. From it we calculate
         the meta file, as well as any translations available, and
         the .html fragment file path.
+
+        If metadata is given, it must be the output of get_post_metadata
+        for this post (for example, from the scan cache), and the source
+        files are not read again.
         """
         self.config = config
         self.compiler = compiler
@@ -94,7 +100,6 @@ class Post(object):
             self.current_time = None
         else:
             self.current_time = current_time(tzinfo)
-        self.translated_to = set([])
         self._prev_post = None
         self._next_post = None
         self.base_url = self.config['BASE_URL']
@@ -117,11 +122,19 @@ class Post(object):
         self.messages = messages
         self.skip_untranslated = self.config['HIDE_UNTRANSLATED_POSTS']
         self._template_name = template_name
-        self.is_two_file = True
         self.hyphenate = self.config['HYPHENATE']
         self._reading_time = None
+        self._text_cache = {}
+        self._fragment_deps = {}
+        self._alltags = None
+
+        if metadata is None:
+            metadata = get_post_metadata(self.source_path, self.config)
+        self.is_two_file = metadata['is_two_file']
+        self.translated_to = set(metadata['translated_to'])
 
-        default_metadata = get_meta(self, self.config['FILE_METADATA_REGEXP'])
+        default_metadata = defaultdict(lambda: '')
+        default_metadata.update(metadata['meta'][self.default_lang])
 
         self.meta = Functionary(lambda: None, self.default_lang)
         self.meta[self.default_lang] = default_metadata
@@ -129,15 +142,10 @@ class Post(object):
         # Load internationalized metadata
         for lang in self.translations:
             if lang != self.default_lang:
-                if os.path.isfile(get_translation_candidate(self.config, self.source_path, lang)):
-                    self.translated_to.add(lang)
-
                 meta = defaultdict(lambda: '')
                 meta.update(default_metadata)
-                meta.update(get_meta(self, self.config['FILE_METADATA_REGEXP'], lang))
+                meta.update(metadata['meta'][lang])
                 self.meta[lang] = meta
-            elif os.path.isfile(self.source_path):
-                self.translated_to.add(self.default_lang)
 
         if not self.is_translation_available(self.default_lang):
             # Special case! (Issue #373)
@@ -205,10 +213,12 @@ class Post(object):
     @property
     def alltags(self):
         """This is ALL the tags for this post."""
-        tags = []
-        for l in self._tags:
-            tags.extend(self._tags[l])
-        return list(set(tags))
+        if self._alltags is None:
+            tags = []
+            for l in self._tags:
+                tags.extend(self._tags[l])
+            self._alltags = list(set(tags))
+        return self._alltags
 
     @property
     def tags(self):
@@ -312,12 +322,25 @@ class Post(object):
                 self.is_two_file),
         if self.meta('password'):
             wrap_encrypt(dest, self.meta('password'))
+        # Compiling may have written a new .dep file
+        self._fragment_deps.pop(lang, None)
         if self.publish_later:
             LOGGER.notice('{0} is scheduled to be published in the future ({1})'.format(
                 self.source_path, self.date))
 
     def fragment_deps(self, lang):
-        """Return a list of dependencies to build this post's fragment."""
+        """Return a list of dependencies to build this post's fragment.
+
+        The list is computed once per language and then reused, so task
+        generators can ask for it as often as they like without touching
+        the filesystem again.
+        """
+        if lang not in self._fragment_deps:
+            self._fragment_deps[lang] = self._find_fragment_deps(lang)
+        return list(self._fragment_deps[lang])
+
+    def _find_fragment_deps(self, lang):
+        """Look for the fragment dependencies of this post in lang."""
         deps = []
         if self.default_lang in self.translated_to:
             deps.append(self.source_path)
@@ -382,6 +405,18 @@ class Post(object):
         if lang is None:
             lang = nikola.utils.LocaleBorg().current_lang
         file_name = self._translated_file_path(lang)
+        # The result only changes if the fragment is compiled again
+        key = (lang, teaser_only, strip_html, really_absolute)
+        signature = file_signature(file_name)
+        cached = self._text_cache.get(key)
+        if cached is not None and signature is not None and cached[0] == signature:
+            return cached[1]
+        data = self._text(file_name, lang, teaser_only, strip_html, really_absolute)
+        self._text_cache[key] = (signature, data)
+        return data
+
+    def _text(self, file_name, lang, teaser_only, strip_html, really_absolute):
+        """Read and process the post fragment, for text()."""
         with codecs.open(file_name, "r", "utf8") as post_file:
             data = post_file.read().strip()
         try:
@@ -650,6 +685,51 @@ def get_metadata_from_meta_file(path, config=None, lang=None):
         return {}
 
 
+class _MetadataSource(object):
+
+    """The parts of a post needed by get_meta, without building a Post."""
+
+    def __init__(self, source_path, config):
+        self.config = config
+        self.source_path = source_path
+        self.metadata_path = os.path.splitext(source_path)[0] + ".meta"
+        self.is_two_file = True
+
+
+def get_post_metadata(source_path, config, translations=None):
+    """Read the metadata of a post in all languages.
+
+    Returns a dictionary that can be serialized to JSON, with the
+    metadata found for each language (``meta``), the languages the
+    post is available in (``translated_to``) and whether it is a
+    two-file post (``is_two_file``). This is what Post.__init__
+    uses, and what the scan cache stores.
+
+    If ``translations`` (a dictionary {lang: path}, as found by
+    Nikola.group_translations) is given, it is used instead of
+    looking for translated sources in the filesystem.
+    """
+    source = _MetadataSource(source_path, config)
+    default_lang = config['DEFAULT_LANG']
+    regexp = config['FILE_METADATA_REGEXP']
+    data = {
+        'meta': {default_lang: dict(get_meta(source, regexp))},
+        'translated_to': [],
+    }
+    for lang in config['TRANSLATIONS']:
+        if lang != default_lang:
+            if translations is not None:
+                if lang in translations:
+                    data['translated_to'].append(lang)
+            elif os.path.isfile(get_translation_candidate(config, source_path, lang)):
+                data['translated_to'].append(lang)
+            data['meta'][lang] = dict(get_meta(source, regexp, lang))
+        elif translations is not None or os.path.isfile(source_path):
+            data['translated_to'].append(default_lang)
+    data['is_two_file'] = source.is_two_file
+    return data
+
+
 def get_meta(post, file_metadata_regexp=None, lang=None):
     """Get post's meta from source.
 
@@ -33,6 +33,7 @@ import datetime
 import hashlib
 import locale
 import logging
+import multiprocessing
 import os
 import re
 import json
@@ -40,10 +41,18 @@ import shutil
 import subprocess
 import sys
 from zipfile import ZipFile as zip
+try:
+    from collections import OrderedDict
+except ImportError:
+    OrderedDict = None  # NOQA
 try:
     from imp import reload
 except ImportError:
     pass
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # NOQA
 
 import logbook
 from logbook.more import ExceptionHandler, ColorizedStderrHandler
@@ -139,7 +148,10 @@ __all__ = ['get_theme_path', 'get_theme_chain', 'load_messages', 'copy_tree',
            '_reload', 'unicode_str', 'bytes_str', 'unichr', 'Functionary',
            'TranslatableSetting', 'LocaleBorg', 'sys_encode', 'sys_decode',
            'makedirs', 'get_parent_theme_name', 'ExtendedRSS2',
-           'demote_headers', 'get_translation_candidate']
+           'demote_headers', 'get_translation_candidate', 'file_signature',
+           'PersistentCache', 'get_worker_count', 'LRUCache',
+           'get_theme_bundles', 'get_asset_fingerprints', 'add_fingerprinted_copy',
+           'filters_for_extension']
 
 
 ENCODING = sys.getfilesystemencoding() or sys.stdin.encoding
@@ -415,6 +427,131 @@ class config_changed(tools.config_changed):
                                                            cls=CustomEncoder))
 
 
+def get_worker_count(config):
+    """Return the number of worker processes to use, from WORKER_PROCESSES."""
+    if config.get('WORKER_PROCESSES'):
+        return config['WORKER_PROCESSES']
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+class LRUCache(object):
+    """A bounded mapping that forgets the least recently used entries."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        if OrderedDict is not None:
+            self._data = OrderedDict()
+        else:
+            self._data = {}
+
+    def get(self, key):
+        """Return the value stored for key, or None."""
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data[key] = value
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store value for key, forgetting the oldest entry if needed."""
+        if key not in self._data and len(self._data) >= self.maxsize:
+            if OrderedDict is not None:
+                self._data.popitem(last=False)
+            else:  # Python 2.6, start again
+                self._data.clear()
+        self._data[key] = value
+
+    def __len__(self):
+        return len(self._data)
+
+
+def file_signature(path):
+    """Return a cheap signature (mtime and size) for a file, or None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime, st.st_size]
+
+
+class PersistentCache(object):
+    """A JSON-backed cache of computed data, stored in CACHE_FOLDER.
+
+    Every entry is stored with a signature (usually made with
+    ``file_signature``), and is only returned if the signature still
+    matches. The ``digest`` describes the configuration that produced the
+    data; if it changes, the whole cache is discarded.
+    """
+
+    version = 1
+
+    def __init__(self, path, digest=''):
+        self.path = path
+        self.digest = digest
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._used = set([])
+        self._dirty = False
+        try:
+            with open(path, 'rb') as inf:
+                stored = json.loads(inf.read().decode('utf-8'))
+            if stored.get('version') == self.version and stored.get('digest') == digest:
+                self._data = stored['entries']
+        except (IOError, OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    def get(self, key, signature):
+        """Return the data stored for key, or None if missing or stale."""
+        entry = self._data.get(key)
+        self._used.add(key)
+        if entry is not None and entry[0] == signature:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def set(self, key, signature, value):
+        """Store value for key with the given signature."""
+        self._data[key] = [signature, value]
+        self._used.add(key)
+        self._dirty = True
+
+    def keep(self, keys):
+        """Mark keys as used, so save(prune=True) doesn't drop them."""
+        self._used.update(keys)
+
+    def save(self, prune=False):
+        """Write the cache to disk.
+
+        If prune is True, entries that were not used since the cache
+        was loaded are dropped.
+        """
+        if prune and set(self._data) - self._used:
+            self._data = dict((k, v) for k, v in self._data.items() if k in self._used)
+            self._dirty = True
+        if not self._dirty:
+            return
+        makedirs(os.path.dirname(self.path))
+        data = json.dumps({'version': self.version, 'digest': self.digest,
+                           'entries': self._data}, sort_keys=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as outf:
+            outf.write(data.encode('utf-8'))
+        if os.path.exists(self.path):
+            os.remove(self.path)  # os.rename can't overwrite on Windows
+        os.rename(tmp_path, self.path)
+        self._dirty = False
+
+
 def get_theme_path(theme):
     """Given a theme name, returns the path where its files are located.
 
@@ -495,7 +632,7 @@ def load_messages(themes, translations, default_lang):
     return messages
 
 
-def copy_tree(src, dst, link_cutoff=None):
+def copy_tree(src, dst, link_cutoff=None, strategy='copy'):
     """Copy a src tree to the dst folder.
 
     Example:
@@ -509,6 +646,8 @@ def copy_tree(src, dst, link_cutoff=None):
     if link_cutoff is set, then the links pointing at things
     *inside* that folder will stay as links, and links
     pointing *outside* that folder will be copied.
+
+    strategy is passed to copy_file (see COPY_STRATEGY).
     """
     ignore = set(['.svn'])
     base_len = len(src.split(os.sep))
@@ -531,12 +670,26 @@ def copy_tree(src, dst, link_cutoff=None):
                 'name': str(dst_file),
                 'file_dep': [src_file],
                 'targets': [dst_file],
-                'actions': [(copy_file, (src_file, dst_file, link_cutoff))],
+                'actions': [(copy_file, (src_file, dst_file, link_cutoff), {'strategy': strategy})],
                 'clean': True,
             }
 
 
-def copy_file(source, dest, cutoff=None):
+def copy_file(source, dest, cutoff=None, strategy='copy'):
+    """Copy source to dest.
+
+    strategy is one of:
+
+    * 'copy': a plain copy, keeping the modification time.
+    * 'hardlink': make dest a hard link to source, so no data is copied.
+      Only use this if nothing modifies dest in place afterwards, since
+      that would modify source too.
+    * 'reflink': a copy-on-write clone of source, on filesystems that
+      support it (like Btrfs and XFS).
+
+    If a link or clone can't be made (like across filesystems), a plain
+    copy is made instead.
+    """
     dst_dir = os.path.dirname(dest)
     makedirs(dst_dir)
     if os.path.islink(source):
@@ -546,14 +699,68 @@ def copy_file(source, dest, cutoff=None):
         # link itself.
         if cutoff is None or not link_target.startswith(cutoff):
             # We copy
-            shutil.copy2(source, dest)
+            _copy_with_strategy(source, dest, strategy)
         else:
             # We link
             if os.path.exists(dest) or os.path.islink(dest):
                 os.unlink(dest)
             os.symlink(os.readlink(source), dest)
     else:
-        shutil.copy2(source, dest)
+        _copy_with_strategy(source, dest, strategy)
+
+
+FICLONE = 0x40049409  # From linux/fs.h
+
+
+def _copy_file_range(inf, outf):
+    """Copy the contents of inf to outf with os.copy_file_range (Python 3.8+)."""
+    size = os.fstat(inf.fileno()).st_size
+    copied = 0
+    while copied < size:
+        n = os.copy_file_range(inf.fileno(), outf.fileno(), size - copied)
+        if not n:
+            raise OSError('copy_file_range copied {0} of {1} bytes'.format(copied, size))
+        copied += n
+
+
+def _copy_with_strategy(source, dest, strategy):
+    """Copy source to dest using strategy, falling back to a plain copy."""
+    if strategy == 'hardlink':
+        source = os.path.realpath(source)
+        if os.path.exists(dest) and os.path.samefile(source, dest):
+            return
+        tmp_dest = dest + '.tmp'
+        try:
+            if os.path.lexists(tmp_dest):
+                os.unlink(tmp_dest)
+            os.link(source, tmp_dest)
+            if os.path.lexists(dest):
+                os.unlink(dest)  # os.rename can't overwrite on Windows
+            os.rename(tmp_dest, dest)
+            return
+        except (OSError, AttributeError):  # No hard links here, or across filesystems
+            if os.path.lexists(tmp_dest):
+                os.unlink(tmp_dest)
+    elif strategy == 'reflink':
+        if os.path.lexists(dest):
+            os.unlink(dest)  # Don't write into a hard link to another file
+        try:
+            with open(source, 'rb') as inf:
+                with open(dest, 'wb') as outf:
+                    try:
+                        fcntl.ioctl(outf.fileno(), FICLONE, inf.fileno())
+                    except (IOError, OSError, AttributeError):
+                        # Can't clone here; copy_file_range still shares
+                        # data on some filesystems, and copies it in the
+                        # kernel on others.
+                        _copy_file_range(inf, outf)
+            shutil.copystat(source, dest)
+            return
+        except (IOError, OSError, AttributeError):
+            pass
+    if os.path.lexists(dest):
+        os.unlink(dest)  # It may be a hard link to source
+    shutil.copy2(source, dest)
 
 
 def remove_file(source):
@@ -697,29 +904,67 @@ def current_time(tzinfo=None):
     return dt
 
 
+def filters_for_extension(filters, ext):
+    """Return the filters (from FILTERS) that apply to files with extension ext."""
+    for key, value in list(filters.items()):
+        if isinstance(key, (tuple, list)):
+            if ext in key:
+                return value
+        elif isinstance(key, (bytes_str, unicode_str)):
+            if ext == key:
+                return value
+        else:
+            assert False, key
+
+
 def apply_filters(task, filters):
     """
     Given a task, checks its targets.
     If any of the targets has a filter that matches,
     adds the filter commands to the commands of the task,
     and the filter itself to the uptodate of the task.
+
+    copy_file actions of tasks with filters always make real copies, even
+    if COPY_STRATEGY says otherwise.
+
+    If the task has a single target, written by an action that
+    accepts filters (like Nikola.render_template), the filters
+    made with filters.apply_to_file that come first are passed to
+    that action, which applies them before writing the file, instead
+    of reading it back.
     """
 
-    def filter_matches(ext):
-        for key, value in list(filters.items()):
-            if isinstance(key, (tuple, list)):
-                if ext in key:
-                    return value
-            elif isinstance(key, (bytes_str, unicode_str)):
-                if ext == key:
-                    return value
-            else:
-                assert False, key
+    def unshared(action):
+        """Make copy_file actions make real copies, so filters don't change the source."""
+        if (isinstance(action, tuple) and action[0] is copy_file and len(action) > 2 and
+                action[2].get('strategy', 'copy') != 'copy'):
+            return (action[0], action[1], dict(action[2], strategy='copy'))
+        return action
+
+    def in_memory(filter_):
+        """Move the leading data filters to an action that accepts them."""
+        actions = [a for a in task['actions'] if isinstance(a, tuple) and
+                   getattr(a[0], 'accepts_filters', False)]
+        if len(task.get('targets', [])) != 1 or len(actions) != 1:
+            return filter_
+        data_filters = []
+        for f in filter_:
+            if not hasattr(f, 'data_filter'):
+                break
+            data_filters.append(f.data_filter)
+        if data_filters:
+            action = actions[0]
+            kwargs = dict(action[2]) if len(action) > 2 else {}
+            kwargs['filters'] = list(kwargs.get('filters', [])) + data_filters
+            task['actions'][task['actions'].index(action)] = (action[0], action[1], kwargs)
+        return filter_[len(data_filters):]
 
     for target in task.get('targets', []):
         ext = os.path.splitext(target)[-1].lower()
-        filter_ = filter_matches(ext)
+        filter_ = filters_for_extension(filters, ext)
         if filter_:
+            task['actions'] = [unshared(a) for a in task['actions']]
+            filter_ = in_memory(list(filter_))
             for action in filter_:
                 def unlessLink(action, target):
                     if not os.path.islink(target):
@@ -826,6 +1071,99 @@ def get_asset_path(path, themes, files_folders={'files': ''}):
     return None
 
 
+def get_theme_bundles(themes):
+    """Given a theme chain, return the bundle definitions."""
+    bundles = {}
+    for theme_name in themes:
+        bundles_path = os.path.join(
+            get_theme_path(theme_name), 'bundles')
+        if os.path.isfile(bundles_path):
+            with open(bundles_path) as fd:
+                for line in fd:
+                    name, files = line.split('=')
+                    files = [f.strip() for f in files.split(',')]
+                    bundles[name.strip().replace('/', os.sep)] = files
+                break
+    return bundles
+
+
+def fingerprinted_name(path, digest):
+    """Add digest to a file name: assets/css/theme.css -> assets/css/theme.<digest>.css"""
+    root, ext = os.path.splitext(path)
+    return '{0}.{1}{2}'.format(root, digest, ext)
+
+
+def get_asset_fingerprints(themes, files_folders, extensions, filters=None, bundles=None, extra=None):
+    """Return fingerprinted names for the assets of the theme chain.
+
+    The result maps asset paths, like ``assets/css/theme.css``, to names
+    including a hash of their contents, like ``assets/css/theme.0a1b2c3d.css``.
+    Only assets with the given extensions are included. Bundles (from
+    get_theme_bundles) are hashed using the assets they are made of. The
+    names of the filters for each extension are part of the hash.
+
+    extra maps paths of generated assets to a string describing their
+    contents; they are used for paths no theme provides.
+    """
+    filters = filters or {}
+    bundles = bundles or {}
+    extra = extra or {}
+
+    def filter_names(path):
+        return [f if isinstance(f, (bytes_str, unicode_str)) else getattr(f, '__name__', '')
+                for f in filters_for_extension(filters, os.path.splitext(path)[1]) or []]
+
+    def add(path, digest):
+        digest.update(repr(filter_names(path)).encode('utf-8'))
+        fingerprints[path.replace(os.sep, '/')] = fingerprinted_name(
+            path, digest.hexdigest()[:8]).replace(os.sep, '/')
+
+    def hash_files(paths):
+        digest = hashlib.md5()
+        for path in paths:
+            with open(path, 'rb') as inf:
+                for chunk in iter(lambda: inf.read(65536), b''):
+                    digest.update(chunk)
+        return digest
+
+    fingerprints = {}
+    paths = set([])
+    for theme_name in themes:
+        assets = os.path.join(get_theme_path(theme_name), 'assets')
+        for root, dirs, files in os.walk(assets):
+            for fname in files:
+                if os.path.splitext(fname)[1].lower() in extensions:
+                    paths.add(os.path.relpath(os.path.join(root, fname),
+                                              get_theme_path(theme_name)))
+    for path in paths:
+        add(path, hash_files([get_asset_path(path, themes, files_folders)]))
+    for path, description in extra.items():
+        if path not in paths:
+            add(path, hashlib.md5(description.encode('utf-8')))
+    for name, files in bundles.items():
+        if os.path.splitext(name)[1].lower() not in extensions:
+            continue
+        sources = [get_asset_path(os.path.join(os.path.dirname(name), fname),
+                                  themes, files_folders)
+                   for fname in files]
+        add(name, hash_files([src for src in sources if src]))
+    return fingerprints
+
+
+def add_fingerprinted_copy(task, output_folder, fingerprints):
+    """Make task also copy its target to its fingerprinted name, if it has one.
+
+    Call this after apply_filters, so the copy is made from the filtered file.
+    """
+    target = task['targets'][0]
+    asset = os.path.relpath(target, output_folder).replace(os.sep, '/')
+    if asset in fingerprints:
+        fingerprinted = os.path.join(output_folder, *fingerprints[asset].split('/'))
+        task['targets'].append(fingerprinted)
+        task['actions'].append((copy_file, (target, fingerprinted)))
+    return task
+
+
 class LocaleBorg(object):
     """
     Provides locale related services and autoritative current_lang,
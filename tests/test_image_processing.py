@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, absolute_import
+
+# This code is so you can run the samples without installing the package,
+# and should be before any import touching nikola, in any file under tests/
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from nikola.image_processing import Image, ImageProcessor, webp_supported
+from nikola.utils import PersistentCache
+
+try:
+    from PIL import features
+except ImportError:
+    features = None  # NOQA
+
+
+@unittest.skipIf(Image is None, 'PIL is not installed')
+class ResizeImageVariantsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.src = os.path.join(self.tmpdir, 'photo.jpg')
+        Image.new('RGB', (800, 600), (200, 30, 30)).save(self.src)
+        self.processor = ImageProcessor()
+        self.processor.logger = mock.Mock()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def out(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def test_all_sizes_from_one_decode(self):
+        with mock.patch('nikola.image_processing.Image.open',
+                        mock.Mock(side_effect=Image.open)) as opener:
+            self.processor.resize_image_variants(self.src, [
+                (self.out('thumb.jpg'), 100),
+                (self.out('large.jpg'), 400),
+            ])
+        self.assertEqual(opener.call_count, 1)
+        self.assertEqual(Image.open(self.out('thumb.jpg')).size, (100, 75))
+        self.assertEqual(Image.open(self.out('large.jpg')).size, (400, 300))
+        self.assertFalse(self.processor.logger.warn.called)
+
+    def test_small_images_are_copied(self):
+        self.processor.resize_image_variants(self.src, [
+            (self.out('thumb.jpg'), 100),
+            (self.out('copy.jpg'), 1000),
+        ])
+        with open(self.src, 'rb') as a, open(self.out('copy.jpg'), 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+        self.assertEqual(Image.open(self.out('thumb.jpg')).size, (100, 75))
+
+    def test_progressive_variants(self):
+        self.processor.resize_image_variants(
+            self.src, [(self.out('large.jpg'), 400)], progressive_jpeg=True)
+        self.assertTrue(Image.open(self.out('large.jpg')).info.get('progressive'))
+
+    @unittest.skipIf(features is None or not features.check('webp'),
+                     'Pillow has no WebP support')
+    def test_converted_variants(self):
+        self.processor.resize_image_variants(self.src, [
+            (self.out('copy.jpg.webp'), 1000),
+        ])
+        webp = Image.open(self.out('copy.jpg.webp'))
+        self.assertEqual(webp.format, 'WEBP')
+        self.assertEqual(webp.size, (800, 600))
+
+    def test_failed_webp_variants(self):
+        real_save = Image.Image.save
+
+        def save(im, fp, *args, **kwargs):
+            if str(fp).endswith('.webp') or (args and args[0] == 'WEBP'):
+                with open(fp, 'wb') as outf:  # Half-written
+                    outf.write(b'RIFF')
+                raise IOError('encoder webp not available')
+            return real_save(im, fp, *args, **kwargs)
+
+        with mock.patch.object(Image.Image, 'save', save):
+            self.processor.resize_image_variants(self.src, [
+                (self.out('large.jpg'), 400),
+                (self.out('large.jpg.webp'), 400),
+            ])
+        self.assertEqual(Image.open(self.out('large.jpg')).size, (400, 300))
+        self.assertFalse(os.path.exists(self.out('large.jpg.webp')))
+        self.assertTrue(self.processor.logger.warn.called)
+
+    def test_webp_supported_without_pil_features(self):
+        def save(im, fp, *args, **kwargs):
+            raise IOError('encoder webp not available')
+
+        with mock.patch('nikola.image_processing.features', None):
+            with mock.patch.object(Image.Image, 'save', save):
+                self.assertFalse(webp_supported())
+
+    def test_exif_orientation_and_date(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotated 90° clockwise
+        exif[0x9003] = '2012:10:01 22:41:00'  # DateTimeOriginal
+        Image.new('RGB', (800, 600)).save(self.src, exif=exif)
+        self.processor.resize_image(self.src, self.out('thumb.jpg'), 400)
+        self.assertEqual(Image.open(self.out('thumb.jpg')).size, (300, 400))
+        self.assertEqual(self.processor.image_date(self.src).year, 2012)
+
+    def test_image_info_is_cached(self):
+        cache_path = self.out('cache.json')
+        cache = PersistentCache(cache_path)
+        info = self.processor.image_info(self.src, cache)
+        self.assertEqual(info['size'], [800, 600])
+        cache.save()
+
+        cache = PersistentCache(cache_path)
+        with mock.patch('nikola.image_processing.Image.open') as opener:
+            self.assertEqual(self.processor.image_info(self.src, cache), info)
+        self.assertFalse(opener.called)
+
+    def test_resize_image(self):
+        self.processor.resize_image(self.src, self.out('thumb.jpg'), 200)
+        self.assertEqual(Image.open(self.out('thumb.jpg')).size, (200, 150))
+
+    @unittest.skipIf(not hasattr(os, 'link'), 'No hard links here')
+    def test_resizing_a_hard_link_keeps_the_source(self):
+        with open(self.src, 'rb') as inf:
+            original = inf.read()
+        self.processor.resize_image_variants(
+            self.src, [(self.out('large.jpg'), 1000)], copy_strategy='hardlink')
+        self.assertTrue(os.path.samefile(self.src, self.out('large.jpg')))
+
+        # Like a later build with a smaller MAX_IMAGE_SIZE
+        self.processor.resize_image_variants(self.src, [(self.out('large.jpg'), 400)])
+        self.assertEqual(Image.open(self.out('large.jpg')).size, (400, 300))
+        with open(self.src, 'rb') as inf:
+            self.assertEqual(inf.read(), original)
+
+
+if __name__ == '__main__':
+    unittest.main()
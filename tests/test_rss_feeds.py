@@ -10,9 +10,13 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 
 from collections import defaultdict
+import datetime
 from io import StringIO
+import json
 import os
 import re
+import shutil
+import tempfile
 import unittest
 
 import mock
@@ -21,6 +25,7 @@ from lxml import etree
 from .base import LocaleSupportInTesting
 
 import nikola
+import nikola.feeds
 
 fake_conf = defaultdict(str)
 fake_conf['TIMEZONE'] = 'UTC'
@@ -61,9 +66,9 @@ class RSSFeedTest(unittest.TestCase):
                                                       'post.tmpl',
                                                       FakeCompiler())
 
-                    opener_mock = mock.mock_open()
+                    writer_mock = mock.Mock()
 
-                    with mock.patch('nikola.nikola.codecs.open', opener_mock, create=True):
+                    with mock.patch('nikola.feeds.write_if_changed', writer_mock):
                         nikola.nikola.utils.generic_rss_renderer('en',
                                                                  "blog_title",
                                                                  self.blog_url,
@@ -73,16 +78,14 @@ class RSSFeedTest(unittest.TestCase):
                                                                  'testfeed.rss',
                                                                  True)
 
-                    opener_mock.assert_called_once_with(
-                        'testfeed.rss', 'wb+', 'utf-8')
+                    writer_mock.assert_called_once_with(
+                        'testfeed.rss', mock.ANY)
 
                     # Python 3 / unicode strings workaround
                     # lxml will complain if the encoding is specified in the
                     # xml when running with unicode strings.
                     # We do not include this in our content.
-                    open_handle = opener_mock()
-                    file_content = [call[1][0]
-                                    for call in open_handle.mock_calls[1:-1]][0]
+                    file_content = writer_mock.call_args[0][1]
                     splitted_content = file_content.split('\n')
                     self.encoding_declaration = splitted_content[0]
                     content_without_encoding_declaration = splitted_content[1:]
@@ -141,5 +144,40 @@ class RSSFeedTest(unittest.TestCase):
 
         self.assertTrue(xmlschema.validate(document))
 
+
+class FeedFormatsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.paths = dict((fmt, nikola.feeds.feed_path(os.path.join(self.tmp, 'rss.xml'), fmt))
+                          for fmt in ('rss', 'atom', 'json'))
+        self.feed = {'title': 'blog_title', 'link': 'http://some.blog/', 'description': None,
+                     'feed_url': 'http://some.blog/rss.xml', 'language': 'en'}
+        self.items = [{'title': 'post title', 'link': 'http://some.blog/post.html',
+                       'guid': 'http://some.blog/post.html', 'description': '<p>text</p>',
+                       'date': datetime.datetime(2012, 10, 1, 22, 41), 'categories': ['tag']}]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_all_formats_written(self):
+        nikola.feeds.write_feeds(self.paths, self.feed, self.items)
+        atom = etree.parse(self.paths['atom'])
+        ns = {'atom': 'http://www.w3.org/2005/Atom'}
+        self.assertEqual(atom.findtext('atom:updated', namespaces=ns), '2012-10-01T22:41:00Z')
+        self.assertEqual(atom.find('atom:entry/atom:link', namespaces=ns).get('href'),
+                         'http://some.blog/post.html')
+        with open(self.paths['json']) as inf:
+            data = json.load(inf)
+        self.assertEqual(data['feed_url'], 'http://some.blog/rss.json')
+        self.assertEqual(data['items'][0]['content_html'], '<p>text</p>')
+        with open(self.paths['rss']) as inf:
+            self.assertIn('<lastBuildDate>Mon, 01 Oct 2012 22:41:00 GMT</lastBuildDate>', inf.read())
+
+    def test_unchanged_feeds_not_rewritten(self):
+        nikola.feeds.write_feeds(self.paths, self.feed, self.items)
+        with mock.patch('nikola.feeds.utils.makedirs') as makedirs:
+            nikola.feeds.write_feeds(self.paths, self.feed, self.items)
+            self.assertFalse(makedirs.called)
+
 if __name__ == '__main__':
     unittest.main()
@@ -8,11 +8,17 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 
+import shutil
+import tempfile
 import unittest
 import mock
 import lxml.html
+import nikola.nikola
+from nikola.filters import apply_to_file
 from nikola.post import get_meta
-from nikola.utils import demote_headers, TranslatableSetting
+from nikola.utils import (demote_headers, TranslatableSetting, PersistentCache,
+                          apply_filters, LRUCache, get_asset_fingerprints,
+                          add_fingerprinted_copy, copy_file)
 
 
 class dummy(object):
@@ -398,5 +404,163 @@ class TranslatableSettingsTest(unittest.TestCase):
         self.assertEqual(inp['zz'], cf)
 
 
+class PersistentCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache', 'test.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+        cache = PersistentCache(self.path, 'digest')
+        self.assertEqual(cache.get('foo', [1, 2]), None)
+        cache.set('foo', [1, 2], {'title': 'Foo'})
+        cache.save()
+
+        cache = PersistentCache(self.path, 'digest')
+        self.assertEqual(cache.get('foo', [1, 2]), {'title': 'Foo'})
+        self.assertEqual(cache.get('foo', [1, 3]), None)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_digest_change_discards_cache(self):
+        cache = PersistentCache(self.path, 'digest')
+        cache.set('foo', [1, 2], 'bar')
+        cache.save()
+
+        cache = PersistentCache(self.path, 'other')
+        self.assertEqual(cache.get('foo', [1, 2]), None)
+
+    def test_prune(self):
+        cache = PersistentCache(self.path)
+        cache.set('foo', None, 1)
+        cache.set('bar', None, 2)
+        cache.save()
+
+        cache = PersistentCache(self.path)
+        cache.get('foo', None)
+        cache.save(prune=True)
+
+        cache = PersistentCache(self.path)
+        self.assertEqual(cache.get('foo', None), 1)
+        self.assertEqual(cache.get('bar', None), None)
+
+    def test_keep(self):
+        cache = PersistentCache(self.path)
+        cache.set('foo', None, 1)
+        cache.set('bar', None, 2)
+        cache.save()
+
+        cache = PersistentCache(self.path)
+        cache.keep(['bar'])
+        cache.save(prune=True)
+
+        cache = PersistentCache(self.path)
+        self.assertEqual(cache.get('foo', None), None)
+        self.assertEqual(cache.get('bar', None), 2)
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_forgets_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+
+class ApplyFiltersTest(unittest.TestCase):
+    def setUp(self):
+        def render(output_name, filters=None):
+            pass
+        render.accepts_filters = True
+        self.render = render
+        self.upper = apply_to_file(lambda data: data.upper())
+
+    def test_data_filters_passed_to_action(self):
+        task = {'targets': ['out.html'], 'actions': [(self.render, ['out.html'])]}
+        apply_filters(task, {'.html': [self.upper, 'tidy %s']})
+        self.assertEqual(len(task['actions']), 2)
+        self.assertEqual(task['actions'][0][2], {'filters': [self.upper.data_filter]})
+
+    def test_filters_after_command_run_on_file(self):
+        task = {'targets': ['out.html'], 'actions': [(self.render, ['out.html'])]}
+        apply_filters(task, {'.html': ['tidy %s', self.upper]})
+        self.assertEqual(len(task['actions']), 3)
+        self.assertEqual(len(task['actions'][0]), 2)
+
+    def test_other_actions_unchanged(self):
+        task = {'targets': ['out.html'], 'actions': [(lambda: None, [])]}
+        apply_filters(task, {'.html': [self.upper]})
+        self.assertEqual(len(task['actions']), 2)
+
+
+class AssetFingerprintsTest(unittest.TestCase):
+    def test_names_include_content_hash(self):
+        fingerprints = get_asset_fingerprints(['base'], {}, ('.css', '.js'))
+        name = fingerprints['assets/css/theme.css']
+        self.assertRegexpMatches(name, r'^assets/css/theme\.[0-9a-f]{8}\.css$')
+        self.assertEqual(get_asset_fingerprints(['base'], {}, ('.css', '.js')), fingerprints)
+        self.assertNotIn('assets/css/theme.css', get_asset_fingerprints(['base'], {}, ('.js',)))
+
+    def test_filters_change_names(self):
+        plain = get_asset_fingerprints(['base'], {}, ('.css',))
+        minified = get_asset_fingerprints(['base'], {}, ('.css',), {'.css': ['yui-compressor %s']})
+        self.assertNotEqual(plain['assets/css/theme.css'], minified['assets/css/theme.css'])
+        grouped = get_asset_fingerprints(['base'], {}, ('.css',), {('.css', '.js'): ['yui-compressor %s']})
+        self.assertEqual(grouped['assets/css/theme.css'], minified['assets/css/theme.css'])
+
+    def test_add_fingerprinted_copy(self):
+        task = {'targets': [os.path.join('output', 'assets', 'css', 'theme.css')], 'actions': []}
+        add_fingerprinted_copy(task, 'output', {'assets/css/theme.css': 'assets/css/theme.0123abcd.css'})
+        self.assertEqual(task['targets'][1], os.path.join('output', 'assets', 'css', 'theme.0123abcd.css'))
+        self.assertEqual(len(task['actions']), 1)
+
+    def test_links_with_base_url_subfolder(self):
+        site = nikola.nikola.Nikola(BASE_URL='http://example.com/blog/', SITE_URL='http://example.com/blog/')
+        site.GLOBAL_CONTEXT['asset_fingerprints'] = {'assets/css/theme.css': 'assets/css/theme.0123abcd.css'}
+        self.assertEqual(site.url_replacer('/posts/foo.html', '/assets/css/theme.css', 'en'),
+                         '../assets/css/theme.0123abcd.css')
+        self.assertEqual(site.url_replacer('http://example.com/blog/rss.xml',
+                                           '/blog/assets/css/theme.css', 'en'),
+                         'assets/css/theme.0123abcd.css')
+
+
+class CopyStrategyTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.src = os.path.join(self.tmp, 'src.txt')
+        with open(self.src, 'w') as f:
+            f.write('data')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_strategies_copy_contents(self):
+        for strategy in ('copy', 'hardlink', 'reflink'):
+            dst = os.path.join(self.tmp, strategy, 'dst.txt')
+            copy_file(self.src, dst, strategy=strategy)
+            with open(dst) as f:
+                self.assertEqual(f.read(), 'data')
+            copy_file(self.src, dst, strategy=strategy)
+            with open(dst) as f:
+                self.assertEqual(f.read(), 'data')
+
+    @unittest.skipUnless(hasattr(os, 'link'), 'no hard links')
+    def test_hardlink_shares_file(self):
+        dst = os.path.join(self.tmp, 'dst.txt')
+        copy_file(self.src, dst, strategy='hardlink')
+        self.assertTrue(os.path.samefile(self.src, dst))
+
+    def test_filters_force_copy(self):
+        task = {'targets': ['out.jpg'], 'actions': [(copy_file, ('in.jpg', 'out.jpg', None), {'strategy': 'hardlink'})]}
+        apply_filters(task, {'.jpg': ['jpegoptim %s']})
+        self.assertEqual(task['actions'][0][2], {'strategy': 'copy'})
+
+
 if __name__ == '__main__':
     unittest.main()